@@ -0,0 +1,80 @@
+"""Benchmark building and rendering a page of the customer list.
+
+Compares the ModelSerializer path (model instances with prefetched
+addresses, CustomerSerializer and DRF's JSONRenderer) with the one
+CustomerViewSet.list uses (values() rows, CustomerRowSerializer and
+FastJSONRenderer), queries included. Run it against a seeded database:
+
+    python manage.py seed_data
+    python benchmarks/list_rendering.py --rows 1000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "oriontek_api.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from customers.geography import get_geography  # noqa: E402
+from customers.renderers import FastJSONRenderer  # noqa: E402
+from customers.serializers import (  # noqa: E402
+    CustomerRowSerializer,
+    CustomerSerializer,
+)
+from customers.views.customer import CustomerViewSet  # noqa: E402
+
+
+def serializer_page(rows, request):
+    customers = CustomerViewSet.queryset[:rows]
+    data = CustomerSerializer(customers, many=True, context={"request": request}).data
+    return JSONRenderer().render(data)
+
+
+def row_page(rows, request):
+    customers = CustomerViewSet.queryset.prefetch_related(None).values(
+        *CustomerRowSerializer.customer_fields
+    )[:rows]
+    return FastJSONRenderer().render(CustomerRowSerializer(customers).data)
+
+
+def measure(func, rows, request, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(rows, request)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    request = APIRequestFactory().get("/api/customers/")
+    get_geography()
+
+    old, new = serializer_page(args.rows, request), row_page(args.rows, request)
+    if old != new:
+        sys.exit("The two paths rendered different bytes")
+
+    baseline = measure(serializer_page, args.rows, request, args.repeat)
+    fast = measure(row_page, args.rows, request, args.repeat)
+    print(f"{'path':<16} {'ms/page':>10} {'speedup':>8}")
+    print(f"{'serializer':<16} {baseline * 1000:>10.2f} {1:>7.1f}x")
+    print(f"{'values rows':<16} {fast * 1000:>10.2f} {baseline / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Load test comparing the sync (DRF) and async read endpoints.
+
+Start the API under a WSGI and an ASGI server, then point this script at
+both, e.g.:
+
+    gunicorn oriontek_api.wsgi -w 1 --threads 8 -b :8000
+    uvicorn oriontek_api.asgi:application --port 8001
+    python benchmarks/load_test.py --username admin --password secret \\
+        --target wsgi=http://localhost:8000 --target asgi=http://localhost:8001
+
+Every endpoint is requested ``--requests`` times by ``--concurrency``
+concurrent clients. ``--slow-client`` makes each client read its response
+slowly, which is where an ASGI worker pays off: a waiting connection costs
+the event loop nothing, while it ties up a WSGI thread.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+# Each sync path has an async twin under /api/async/
+ENDPOINTS = [
+    ("customer list", "/api/customers/"),
+    ("customer list (no count)", "/api/customers/?count=false"),
+    ("states by country", "/api/states/by_country/?country_id=1"),
+    ("cities by state", "/api/cities/by_state/?state_id=1"),
+    ("dashboard", "/api/dashboard/"),
+]
+
+
+def async_path(path):
+    return path.replace("/api/", "/api/async/", 1)
+
+
+def login(base_url, username, password):
+    body = json.dumps({"username": username, "password": password}).encode()
+    request = Request(
+        f"{base_url}/api/auth/login/",
+        data=body,
+        headers={"Content-Type": "application/json"},
+    )
+    with urlopen(request) as response:
+        return json.load(response)["access"]
+
+
+async def fetch(base_url, path, token, slow_client):
+    url = urlsplit(base_url)
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    writer.write(
+        (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {url.netloc}\r\n"
+            f"Authorization: Bearer {token}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode()
+    )
+    await writer.drain()
+
+    status_line = await reader.readline()
+    while chunk := await reader.read(4096 if slow_client else -1):
+        if slow_client:
+            await asyncio.sleep(slow_client)
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1])
+
+
+async def run(base_url, path, token, args):
+    latencies = []
+    errors = 0
+    remaining = iter(range(args.requests))
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status = await fetch(base_url, path, token, args.slow_client)
+            except OSError:
+                status = None
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": quantiles[49] * 1000,
+        "p95": quantiles[94] * 1000,
+        "p99": quantiles[98] * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--target",
+        action="append",
+        required=True,
+        help="name=base_url of a running server, can be repeated",
+    )
+    parser.add_argument("--token", help="JWT access token")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--slow-client",
+        type=float,
+        default=0,
+        help="seconds to wait between reads of each response chunk",
+    )
+    args = parser.parse_args()
+
+    targets = [target.split("=", 1) for target in args.target]
+    token = args.token or login(targets[0][1], args.username, args.password)
+
+    print(
+        f"{'target':<8} {'endpoint':<28} {'path':<8} "
+        f"{'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    )
+    for name, base_url in targets:
+        for label, path in ENDPOINTS:
+            for kind, url_path in [("sync", path), ("async", async_path(path))]:
+                result = asyncio.run(run(base_url, url_path, token, args))
+                print(
+                    f"{name:<8} {label:<28} {kind:<8} {result['rps']:>8.1f} "
+                    f"{result['p50']:>8.1f} {result['p95']:>8.1f} "
+                    f"{result['p99']:>8.1f} {result['errors']:>7}"
+                )
+
+
+if __name__ == "__main__":
+    main()
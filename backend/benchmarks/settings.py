@@ -0,0 +1,21 @@
+"""Project settings for benchmarks/suite.py.
+
+The suite runs on SQLite unless BENCHMARK_DB=mysql, in which case it uses
+the project's MySQL connection (and its test database).
+"""
+
+import os
+
+from oriontek_api.settings import *  # noqa: F401,F403
+from oriontek_api.settings import BASE_DIR
+
+if os.environ.get("BENCHMARK_DB", "sqlite") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "benchmarks" / "benchmark.sqlite3",
+        }
+    }
+
+DEBUG = False
+JOBS_EAGER = True
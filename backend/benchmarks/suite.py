@@ -0,0 +1,291 @@
+"""Benchmark suite for the customers API, with a JSON baseline.
+
+Builds a throwaway test database filled by customers.synthetic, then times
+the main endpoints in process through DRF's test client, with real JWT
+authentication. For every scenario it records latency percentiles, the
+number of queries and the peak memory of one request:
+
+    python benchmarks/suite.py --save baseline.json
+    python benchmarks/suite.py --baseline baseline.json
+
+With ``--baseline`` the run fails (exit status 1) when a scenario's median
+latency or peak memory grows by more than ``--threshold`` or it runs more
+queries than before. SQLite is used unless ``--db mysql`` is given, in
+which case the project's MySQL server must be reachable.
+
+For HTTP load against running WSGI/ASGI servers see load_test.py; for the
+list serializers alone, list_rendering.py.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--countries", type=int, default=5)
+    parser.add_argument("--states-per-country", type=int, default=4)
+    parser.add_argument("--cities-per-state", type=int, default=5)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--addresses-per-customer", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", action="append", help="run only these scenarios")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed relative growth of latency and memory (default 0.25)",
+    )
+    parser.add_argument(
+        "--min-ms",
+        type=float,
+        default=2,
+        help="latency changes smaller than this are never regressions",
+    )
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ["BENCHMARK_DB"] = ARGS.db
+os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from customers.geography import get_geography  # noqa: E402
+from customers.models import Customer  # noqa: E402
+from customers.synthetic import SyntheticData  # noqa: E402
+
+PASSWORD = "benchmark-password"
+BULK_DELETE_SIZE = 200
+
+
+class Context:
+    """State shared by the scenarios: the user, a token and some ids to filter on"""
+
+    def __init__(self, user):
+        self.user = user
+        self.access = str(RefreshToken.for_user(user).access_token)
+        geography = get_geography()
+        self.country_id = min(geography.countries)
+        self.state_id = min(geography.states)
+        self.next_seed = 1_000_000
+
+    def customer_ids(self, count):
+        """Create ``count`` throwaway customers and return their ids"""
+        self.next_seed += 1
+        SyntheticData(seed=self.next_seed).customers(
+            count, 1, list(get_geography().cities)
+        )
+        return list(
+            Customer.objects.filter(
+                email__endswith=f".{self.next_seed}@example.com"
+            ).values_list("id", flat=True)
+        )
+
+
+def bulk_delete(context):
+    return {"data": {"customer_ids": context.customer_ids(BULK_DELETE_SIZE)}}
+
+
+def login(context):
+    return {"data": {"username": context.user.username, "password": PASSWORD}}
+
+
+def refresh(context):
+    return {"data": {"refresh": str(RefreshToken.for_user(context.user))}}
+
+
+def logout(context):
+    token = RefreshToken.for_user(context.user)
+    return {
+        "data": {"refresh": str(token)},
+        "HTTP_AUTHORIZATION": f"Bearer {token.access_token}",
+    }
+
+
+# name, method, path (formatted with the context) and an untimed setup that
+# returns extra arguments for the request
+SCENARIOS = [
+    ("customer list", "get", "/api/customers/", None),
+    ("customer list page 50", "get", "/api/customers/?page=50", None),
+    ("customer list no count", "get", "/api/customers/?count=false", None),
+    ("customer list cursor", "get", "/api/customers/?pagination=cursor", None),
+    ("customer search", "get", "/api/customers/?search=maria", None),
+    (
+        "filter by country",
+        "get",
+        "/api/customers/?country_id={context.country_id}",
+        None,
+    ),
+    ("filter by state", "get", "/api/customers/?state_id={context.state_id}", None),
+    ("report xlsx", "get", "/api/customers/generate_report/", None),
+    ("report csv", "get", "/api/customers/generate_report/?file_type=csv", None),
+    (
+        "report combined csv",
+        "get",
+        "/api/customers/generate_report/?format=combined&file_type=csv",
+        None,
+    ),
+    ("dashboard stats", "get", "/api/dashboard/", None),
+    ("bulk delete", "post", "/api/customers/bulk_delete/", bulk_delete),
+    ("auth login", "post", "/api/auth/login/", login),
+    ("auth refresh", "post", "/api/auth/refresh/", refresh),
+    ("auth logout", "post", "/api/auth/logout/", logout),
+]
+
+
+def request(client, method, path, kwargs):
+    response = getattr(client, method)(path, format="json", **kwargs)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method.upper()} {path}: {response.status_code}")
+    return response
+
+
+def run_scenario(client, context, method, path, setup, repeat):
+    path = path.format(context=context)
+    prepare = setup or (lambda context: {})
+
+    # Warm up, then count queries and peak memory on one untimed request
+    request(client, method, path, prepare(context))
+    kwargs = prepare(context)
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        request(client, method, path, kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    query_count = len(queries)
+
+    timings = []
+    for _ in range(repeat):
+        kwargs = prepare(context)
+        started = time.perf_counter()
+        request(client, method, path, kwargs)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    quantiles = statistics.quantiles(timings, n=100, method="inclusive")
+    return {
+        "p50_ms": round(quantiles[49], 3),
+        "p95_ms": round(quantiles[94], 3),
+        "p99_ms": round(quantiles[98], 3),
+        "queries": query_count,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def regressions(results, baseline, threshold, min_ms):
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        limit = before["p50_ms"] * (1 + threshold)
+        if result["p50_ms"] > limit and result["p50_ms"] - before["p50_ms"] > min_ms:
+            found.append(f"{name}: p50 {before['p50_ms']} -> {result['p50_ms']} ms")
+        if result["queries"] > before["queries"]:
+            found.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+        if result["peak_memory_kb"] > before["peak_memory_kb"] * (1 + threshold):
+            found.append(
+                f"{name}: peak memory {before['peak_memory_kb']} -> "
+                f"{result['peak_memory_kb']} KiB"
+            )
+    return found
+
+
+def main():
+    setup_test_environment()
+    # Report jobs write their files here; removed with the test database
+    reports_root = override_settings(
+        REPORTS_ROOT=tempfile.mkdtemp(prefix="benchmark-reports-")
+    )
+    reports_root.enable()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        data = SyntheticData(seed=ARGS.seed)
+        city_ids = data.geography(
+            ARGS.countries, ARGS.states_per_country, ARGS.cities_per_state
+        )
+        data.customers(ARGS.customers, ARGS.addresses_per_customer, city_ids)
+
+        user = User.objects.create_user(username="benchmark", password=PASSWORD)
+        context = Context(user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {context.access}")
+
+        results = {}
+        print(
+            f"{'scenario':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+            f"{'queries':>8} {'peak KiB':>10}"
+        )
+        for name, method, path, setup in SCENARIOS:
+            if ARGS.only and name not in ARGS.only:
+                continue
+            result = run_scenario(client, context, method, path, setup, ARGS.repeat)
+            results[name] = result
+            print(
+                f"{name:<24} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                f"{result['p99_ms']:>9.2f} {result['queries']:>8} "
+                f"{result['peak_memory_kb']:>10.1f}"
+            )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(reports_root.options["REPORTS_ROOT"], ignore_errors=True)
+        reports_root.disable()
+
+    report = {
+        "meta": {
+            "database": connection.vendor,
+            "countries": ARGS.countries,
+            "states_per_country": ARGS.states_per_country,
+            "cities_per_state": ARGS.cities_per_state,
+            "customers": ARGS.customers,
+            "addresses_per_customer": ARGS.addresses_per_customer,
+            "seed": ARGS.seed,
+            "repeat": ARGS.repeat,
+        },
+        "results": results,
+    }
+    if ARGS.save:
+        with open(ARGS.save, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if ARGS.baseline:
+        with open(ARGS.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["meta"] != report["meta"]:
+            print("warning: the baseline was recorded with different parameters")
+        found = regressions(results, baseline["results"], ARGS.threshold, ARGS.min_ms)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+from collections import defaultdict
+
+from .models import Address
+
+ADDRESS_FIELDS = ["street", "city_id", "zip_code"]
+
+
+class UnknownAddress(Exception):
+    def __init__(self, address_id):
+        super().__init__(f"Address {address_id} does not belong to this customer.")
+        self.address_id = address_id
+
+
+def _values(data):
+    city = data["city"]
+    return {
+        "street": data["street"],
+        "city_id": getattr(city, "pk", city),
+        "zip_code": data.get("zip_code"),
+    }
+
+
+def _values_of(address):
+    return {
+        "street": address.street,
+        "city_id": address.city_id,
+        "zip_code": address.zip_code,
+    }
+
+
+def _key(values):
+    # Values are stored as submitted; a blank zip code only matches a missing one
+    street, city_id, zip_code = (values[field] for field in ADDRESS_FIELDS)
+    return street, city_id, zip_code or None
+
+
+class AddressChanges:
+    """Inserts, updates and deletes that bring addresses in line with a payload"""
+
+    def __init__(self):
+        self.create = []
+        self.update = []
+        self.delete = []
+
+    def plan(self, customer_id, existing, incoming):
+        """Diff the ``existing`` addresses of a customer against ``incoming`` data.
+
+        Items carrying an ``id`` are matched to that address. Items without
+        one first claim an identical unmatched address, then reuse any address
+        left over, so a resubmitted form costs no writes at all.
+        """
+        by_id = {address.id: address for address in existing}
+        claimed = set()
+        pending = []
+
+        for data in incoming:
+            values = _values(data)
+            address_id = data.get("id")
+            if address_id is None:
+                pending.append(values)
+                continue
+            address = by_id.get(address_id)
+            if address is None or address_id in claimed:
+                raise UnknownAddress(address_id)
+            claimed.add(address_id)
+            self._assign(address, values)
+
+        unclaimed = defaultdict(list)
+        for address in existing:
+            if address.id not in claimed:
+                unclaimed[_key(_values_of(address))].append(address)
+
+        leftover = []
+        for values in pending:
+            matches = unclaimed.get(_key(values))
+            if matches:
+                claimed.add(matches.pop(0).id)
+            else:
+                leftover.append(values)
+
+        reusable = [address for address in existing if address.id not in claimed]
+        for values in leftover:
+            if reusable:
+                self._assign(reusable.pop(0), values)
+            else:
+                self.create.append(Address(customer_id=customer_id, **values))
+        self.delete.extend(address.id for address in reusable)
+
+        return self
+
+    def _assign(self, address, values):
+        if _key(_values_of(address)) == _key(values):
+            return
+        for field, value in values.items():
+            setattr(address, field, value)
+        self.update.append(address)
+
+    def merge(self, other):
+        """Add the changes planned by another AddressChanges"""
+        self.create.extend(other.create)
+        self.update.extend(other.update)
+        self.delete.extend(other.delete)
+        return self
+
+    def apply(self, batch_size=None):
+        """Write the planned changes, one statement per kind of change"""
+        if self.delete:
+            Address.objects.filter(id__in=self.delete).delete()
+        if self.update:
+            Address.objects.bulk_update(
+                self.update, ADDRESS_FIELDS, batch_size=batch_size
+            )
+        if self.create:
+            Address.objects.bulk_create(self.create, batch_size=batch_size)
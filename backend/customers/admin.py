@@ -1,8 +1,50 @@
 from django.contrib import admin
-from .models import Customer, Country, State, City, Address
+from .geography import city_label
+from .models import Customer, Country, State, City, Address, BackgroundJob
 
-admin.site.register(Customer)
-admin.site.register(Country)
-admin.site.register(State)
-admin.site.register(City)
-admin.site.register(Address)
+# State, City and Address labels come from the cached geography index, so
+# listing them costs no query per row.
+
+
+class AddressInline(admin.TabularInline):
+    model = Address
+    extra = 0
+
+
+@admin.register(Customer)
+class CustomerAdmin(admin.ModelAdmin):
+    list_display = ["name", "email", "phone", "created_at"]
+    search_fields = ["name", "email"]
+    inlines = [AddressInline]
+
+
+@admin.register(Country)
+class CountryAdmin(admin.ModelAdmin):
+    list_display = ["name", "code"]
+
+
+@admin.register(State)
+class StateAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "country"]
+    list_select_related = ["country"]
+
+
+@admin.register(City)
+class CityAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "state"]
+    list_select_related = ["state"]
+
+
+@admin.register(Address)
+class AddressAdmin(admin.ModelAdmin):
+    list_display = ["street", "customer", "location", "zip_code"]
+    list_select_related = ["customer"]
+    raw_id_fields = ["customer"]
+    search_fields = ["street", "customer__name", "customer__email"]
+
+    @admin.display(description="Location")
+    def location(self, obj):
+        return city_label(obj.city_id)
+
+
+admin.site.register(BackgroundJob)
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class CustomersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'customers'
-    
+
+    def ready(self):
+        from . import deletion, signals  # noqa: F401
+        from .reports import jobs  # noqa: F401
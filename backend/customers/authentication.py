@@ -0,0 +1,124 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .blacklist import ais_blacklisted, is_blacklisted
+
+# sha256(raw token) -> (cached until, validated token)
+_validated_tokens = {}
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication for async views.
+
+    The token is validated in-process; only the user lookup touches the
+    database, through the async ORM.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+def _evict_tokens(now):
+    for key, (expires, validated_token) in list(_validated_tokens.items()):
+        if expires <= now:
+            _validated_tokens.pop(key, None)
+    while len(_validated_tokens) >= settings.JWT_TOKEN_CACHE_SIZE:
+        _validated_tokens.pop(next(iter(_validated_tokens)), None)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """JWT authentication that trusts the signed claims instead of the database.
+
+    ``request.user`` is a TokenUser built from the token payload. Validated
+    tokens are cached by hash for JWT_TOKEN_CACHE_TTL seconds and revoked
+    ones are rejected through the in-memory blacklist, so authenticating
+    costs no query. A deactivated user keeps access until the token expires.
+    """
+
+    def decode_token(self, raw_token):
+        key = hashlib.sha256(raw_token).digest()
+        now = time.time()
+        cached = _validated_tokens.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        validated_token = super().get_validated_token(raw_token)
+        if len(_validated_tokens) >= settings.JWT_TOKEN_CACHE_SIZE:
+            _evict_tokens(now)
+        _validated_tokens[key] = (
+            min(now + settings.JWT_TOKEN_CACHE_TTL, validated_token["exp"]),
+            validated_token,
+        )
+        return validated_token
+
+    def get_validated_token(self, raw_token):
+        validated_token = self.decode_token(raw_token)
+        if is_blacklisted(validated_token.get(api_settings.JTI_CLAIM)):
+            raise InvalidToken(_("Token is blacklisted"))
+        return validated_token
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.decode_token(raw_token)
+        if await ais_blacklisted(validated_token.get(api_settings.JTI_CLAIM)):
+            raise InvalidToken(_("Token is blacklisted"))
+        return self.get_user(validated_token), validated_token
+
+
+def get_authenticator():
+    """The JWT authentication selected by JWT_STATELESS_AUTH, for sync or async views"""
+    if settings.JWT_STATELESS_AUTH:
+        return StatelessJWTAuthentication()
+    return AsyncJWTAuthentication()
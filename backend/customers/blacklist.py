@@ -0,0 +1,150 @@
+import hashlib
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+VERSION_KEY = "customers:blacklist:version"
+DATA_KEY = "customers:blacklist:data"
+
+_local = None
+
+
+def jti_hash(jti):
+    """64-bit hash of a jti; the in-memory blacklist only keeps these"""
+    return int.from_bytes(
+        hashlib.blake2b(str(jti).encode(), digest_size=8).digest(), "big"
+    )
+
+
+class Blacklist:
+    """Hashed set of the unexpired blacklisted token jtis.
+
+    A jti whose hash isn't in the set is definitely not blacklisted. A hit
+    may be a hash collision and is confirmed against the database.
+    """
+
+    def __init__(self, version, hashes):
+        self.version = version
+        self.hashes = frozenset(hashes)
+        self.checked_at = time.monotonic()
+
+    def __contains__(self, jti):
+        return jti_hash(jti) in self.hashes
+
+    @staticmethod
+    def load_hashes():
+        jtis = BlacklistedToken.objects.filter(
+            token__expires_at__gt=timezone.now()
+        ).values_list("token__jti", flat=True)
+        return [jti_hash(jti) for jti in jtis.iterator()]
+
+
+def check_due(max_age=None):
+    if max_age is None:
+        max_age = settings.JWT_BLACKLIST_REFRESH_INTERVAL
+    return _local is None or time.monotonic() - _local.checked_at >= max_age
+
+
+def get_blacklist(max_age=None):
+    """Return the in-memory blacklist, reloading it only when it has changed.
+
+    Like the geography index, the current version and the hashes live in
+    Django's cache: after ``max_age`` seconds (JWT_BLACKLIST_REFRESH_INTERVAL
+    by default) the version is compared again, and a changed blacklist is
+    reloaded from the cache before falling back to the database.
+
+    Both cache entries expire after JWT_BLACKLIST_REFRESH_INTERVAL seconds,
+    so the hashes are reloaded from the database at least that often. A
+    per-process cache never sees another process's invalidation, and this
+    bounds how long a token blacklisted elsewhere keeps working.
+    """
+    global _local
+
+    if not check_due(max_age):
+        return _local
+
+    version = cache.get(VERSION_KEY)
+    if _local and version == _local.version:
+        _local.checked_at = time.monotonic()
+        return _local
+
+    data = cache.get(DATA_KEY)
+    if version is None or data is None or data["version"] != version:
+        version = uuid.uuid4().hex
+        data = {"version": version, "hashes": Blacklist.load_hashes()}
+        cache.set_many(
+            {VERSION_KEY: version, DATA_KEY: data},
+            timeout=settings.JWT_BLACKLIST_REFRESH_INTERVAL,
+        )
+
+    _local = Blacklist(version, data["hashes"])
+    return _local
+
+
+def invalidate_blacklist():
+    global _local
+    _local = None
+    cache.delete_many([VERSION_KEY, DATA_KEY])
+
+
+def is_blacklisted(jti, max_age=None):
+    if jti not in get_blacklist(max_age):
+        return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+async def ais_blacklisted(jti, max_age=None):
+    if check_due(max_age):
+        await sync_to_async(get_blacklist)(max_age)
+    if jti not in _local:
+        return False
+    return await BlacklistedToken.objects.filter(token__jti=jti).aexists()
+
+
+def blacklist_token(token):
+    """Blacklist any simplejwt token, including access tokens"""
+    outstanding, _ = OutstandingToken.objects.get_or_create(
+        jti=token[api_settings.JTI_CLAIM],
+        defaults={
+            "user_id": token.get(api_settings.USER_ID_CLAIM),
+            "created_at": token.current_time,
+            "token": str(token),
+            "expires_at": datetime_from_epoch(token["exp"]),
+        },
+    )
+    blacklisted = BlacklistedToken.objects.get_or_create(token=outstanding)
+    invalidate_blacklist()
+    # Drop anything another request cached from the pre-commit rows too
+    transaction.on_commit(invalidate_blacklist)
+    return blacklisted
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """RefreshToken checked against the in-memory blacklist.
+
+    Refreshing a token only queries the blacklist tables on a hash hit. The
+    cached version is compared on every check, so a token blacklisted by
+    another process is rejected right away when the cache is shared, and
+    within JWT_BLACKLIST_REFRESH_INTERVAL seconds when it isn't.
+    """
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM], max_age=0):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        return blacklist_token(self)
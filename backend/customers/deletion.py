@@ -0,0 +1,74 @@
+from django.db import connections, models, transaction
+
+from . import stats
+from .conditional import touch_customers
+from .jobs import register, set_progress
+from .models import Customer, Address
+
+CHUNK_SIZE = 1000
+
+
+def _delete_in(connection, model, field, ids):
+    """DELETE the rows of ``model`` whose ``field`` is in ``ids``, return the count"""
+    quote = connection.ops.quote_name
+    column = quote(model._meta.get_field(field).column)
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} "
+            f"WHERE {column} IN ({placeholders})",
+            ids,
+        )
+        return cursor.rowcount
+
+
+def _sql_delete_is_safe():
+    """Only addresses reference customers, and nothing references addresses.
+
+    Relations with ``on_delete=DO_NOTHING``, like the search index's, are
+    left to the database by Django's deletion too.
+    """
+    customer_relations = [
+        rel.related_model
+        for rel in Customer._meta.related_objects
+        if rel.on_delete is not models.DO_NOTHING
+    ]
+    return customer_relations == [Address] and not Address._meta.related_objects
+
+
+def delete_customers(customer_ids, on_chunk=None):
+    """Delete customers and their addresses, CHUNK_SIZE customers at a time.
+
+    Each chunk is its own short transaction. While addresses are the only
+    rows cascading from a customer, both are removed with plain DELETE
+    statements instead of loading them into Django's deletion collector, so
+    no delete signals are sent (dashboard stats are updated directly).
+    Returns the number of customers deleted.
+    """
+    customer_ids = sorted(set(customer_ids))
+    connection = connections[Customer.objects.db]
+    plain = _sql_delete_is_safe()
+    deleted = 0
+
+    for start in range(0, len(customer_ids), CHUNK_SIZE):
+        chunk = customer_ids[start : start + CHUNK_SIZE]
+        with transaction.atomic(using=connection.alias):
+            if plain:
+                with stats.track_customers(chunk):
+                    _delete_in(connection, Address, "customer", chunk)
+                    deleted += _delete_in(connection, Customer, "id", chunk)
+                touch_customers(chunk)
+            else:
+                _, counts = Customer.objects.filter(id__in=chunk).delete()
+                deleted += counts.get(Customer._meta.label, 0)
+        if on_chunk:
+            on_chunk(start + len(chunk))
+
+    return deleted
+
+
+@register("bulk_delete")
+def bulk_delete_customers(job):
+    customer_ids = job.params["customer_ids"]
+    set_progress(job, 0, len(customer_ids))
+    delete_customers(customer_ids, on_chunk=lambda done: set_progress(job, done))
@@ -0,0 +1,67 @@
+from django.db.models import Exists, OuterRef
+from django_filters import rest_framework as filters
+
+from .geography import get_geography
+from .models import Customer, Address
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_ids(value):
+    values = value if isinstance(value, list) else [value]
+    return [int(item) for item in values]
+
+
+def with_address_in(queryset, city_ids):
+    """Customers with at least one address in ``city_ids``, each listed once.
+
+    ``EXISTS`` probes the address (customer_id) index per customer instead
+    of joining addresses, cities and states, so customers with several
+    matching addresses aren't duplicated.
+    """
+    addresses = Address.objects.filter(customer_id=OuterRef("pk"), city_id__in=city_ids)
+    return queryset.filter(Exists(addresses))
+
+
+class CustomerFilter(filters.FilterSet):
+    """Filters for the customer list and reports.
+
+    Countries and states are resolved to their city ids through the cached
+    geography index, so the filters never join the geography tables.
+    """
+
+    country_id = filters.NumberFilter(method="filter_country")
+    country_id__in = NumberInFilter(method="filter_country")
+    state_id = filters.NumberFilter(method="filter_state")
+    state_id__in = NumberInFilter(method="filter_state")
+
+    class Meta:
+        model = Customer
+        fields = ["name", "email"]
+
+    def filter_country(self, queryset, name, value):
+        geography = get_geography()
+        state_ids = [
+            state["id"]
+            for country_id in _as_ids(value)
+            for state in geography.states_by_country.get(country_id, [])
+        ]
+        return self.filter_state(queryset, name, state_ids)
+
+    def filter_state(self, queryset, name, value):
+        geography = get_geography()
+        city_ids = [
+            city["id"]
+            for state_id in _as_ids(value)
+            for city in geography.cities_by_state.get(state_id, [])
+        ]
+        return with_address_in(queryset, city_ids)
@@ -0,0 +1,139 @@
+import time
+import uuid
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Country, State, City
+
+VERSION_KEY = "customers:geography:version"
+DATA_KEY = "customers:geography:data"
+
+_local = None
+
+
+class Geography:
+    """In-memory index of the Country -> State -> City hierarchy.
+
+    Entries are the same dicts CountrySerializer, StateSerializer and
+    CitySerializer produce and are shared between callers, so treat them as
+    read-only.
+    """
+
+    def __init__(self, version, countries, states, cities):
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.countries = {}
+        self.states = {}
+        self.cities = {}
+        self.states_by_country = defaultdict(list)
+        self.cities_by_state = defaultdict(list)
+        # "State, Country" and "City, State, Country" display labels
+        self.state_labels = {}
+        self.city_labels = {}
+
+        for pk, name, code in countries:
+            self.countries[pk] = {"id": pk, "name": name, "code": code}
+        for pk, name, country_id in states:
+            self.states[pk] = {
+                "id": pk,
+                "country": self.countries[country_id],
+                "name": name,
+            }
+            self.states_by_country[country_id].append(self.states[pk])
+            self.state_labels[pk] = f"{name}, {self.countries[country_id]['name']}"
+        for pk, name, state_id in cities:
+            self.cities[pk] = {"id": pk, "state": self.states[state_id], "name": name}
+            self.cities_by_state[state_id].append(self.cities[pk])
+            self.city_labels[pk] = f"{name}, {self.state_labels[state_id]}"
+
+    @staticmethod
+    def load_rows():
+        return {
+            "countries": list(
+                Country.objects.order_by("id").values_list("id", "name", "code")
+            ),
+            "states": list(
+                State.objects.order_by("id").values_list("id", "name", "country_id")
+            ),
+            "cities": list(
+                City.objects.order_by("id").values_list("id", "name", "state_id")
+            ),
+        }
+
+
+def get_geography():
+    """Return the geography index, reloading it only when it has changed.
+
+    The index lives in process memory. Django's cache holds the current
+    version and the raw rows, so other processes pick up a change after
+    GEOGRAPHY_CACHE_CHECK_INTERVAL seconds without querying the database.
+    """
+    global _local
+
+    now = time.monotonic()
+    if _local and now - _local.checked_at < settings.GEOGRAPHY_CACHE_CHECK_INTERVAL:
+        return _local
+
+    version = cache.get(VERSION_KEY)
+    if _local and version == _local.version:
+        _local.checked_at = now
+        return _local
+
+    data = cache.get(DATA_KEY)
+    if version is None or data is None or data["version"] != version:
+        version = uuid.uuid4().hex
+        data = {"version": version, **Geography.load_rows()}
+        cache.set_many({VERSION_KEY: version, DATA_KEY: data}, timeout=None)
+
+    _local = Geography(version, data["countries"], data["states"], data["cities"])
+    return _local
+
+
+async def aget_geography():
+    """Async get_geography(), only leaving the event loop when a check is due"""
+    now = time.monotonic()
+    if _local and now - _local.checked_at < settings.GEOGRAPHY_CACHE_CHECK_INTERVAL:
+        return _local
+    return await sync_to_async(get_geography)()
+
+
+def invalidate_geography():
+    global _local
+    _local = None
+    cache.delete_many([VERSION_KEY, DATA_KEY])
+
+
+def _lookup(attr, pk):
+    """Return ``get_geography().<attr>[pk]``, reloading once if ``pk`` is unknown"""
+    if pk is None:
+        return None
+    value = getattr(get_geography(), attr).get(pk)
+    if value is None:
+        invalidate_geography()
+        value = getattr(get_geography(), attr).get(pk)
+    return value
+
+
+def get_city(city_id):
+    """Return the nested representation of a city, reloading once if unknown"""
+    return _lookup("cities", city_id)
+
+
+def state_label(state_id):
+    return _lookup("state_labels", state_id)
+
+
+def city_label(city_id):
+    return _lookup("city_labels", city_id)
+
+
+async def aget_geography_for(city_ids):
+    """Return the geography index once it knows every id in ``city_ids``"""
+    geography = await aget_geography()
+    if not set(city_ids) <= geography.cities.keys():
+        await sync_to_async(invalidate_geography)()
+        geography = await aget_geography()
+    return geography
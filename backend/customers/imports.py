@@ -0,0 +1,224 @@
+import csv
+import io
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from . import stats
+from .conditional import touch_customers
+from .geography import get_geography
+from .models import Customer, Address
+
+CHUNK_SIZE = 5000
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+COLUMNS = ["name", "email", "phone", "street", "city_id", "zip_code"]
+REQUIRED_COLUMNS = ["name", "email"]
+MAX_LENGTHS = {
+    "name": 255,
+    "email": 254,
+    "phone": 20,
+    "street": 255,
+    "zip_code": 20,
+}
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def _read_csv(upload):
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    yield from reader
+
+
+def _read_xlsx(upload):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(upload.file, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ["" if value is None else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def read_rows(upload):
+    """Yield ``(row_number, row_dict)`` for each data row of a CSV/XLSX upload"""
+    name = upload.name.lower()
+    if name.endswith(".csv"):
+        lines = _read_csv(upload)
+    elif name.endswith(".xlsx"):
+        lines = _read_xlsx(upload)
+    else:
+        raise ImportFileError("Only .csv and .xlsx files are supported.")
+
+    header = [column.strip().lower() for column in next(lines, [])]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ImportFileError(f"Missing required columns: {', '.join(missing)}.")
+
+    positions = {column: header.index(column) for column in COLUMNS if column in header}
+    for row_number, line in enumerate(lines, start=2):
+        if not any(value.strip() for value in line):
+            continue
+        yield row_number, {
+            column: line[idx].strip() if idx < len(line) else ""
+            for column, idx in positions.items()
+        }
+
+
+def validate_row(row, city_ids):
+    errors = {}
+
+    for column in REQUIRED_COLUMNS:
+        if not row.get(column):
+            errors[column] = ["This field is required."]
+    for column, max_length in MAX_LENGTHS.items():
+        if len(row.get(column, "")) > max_length:
+            errors[column] = [
+                f"Ensure this field has no more than {max_length} characters."
+            ]
+
+    if "email" not in errors:
+        try:
+            validate_email(row["email"])
+        except ValidationError as exc:
+            errors["email"] = exc.messages
+
+    street, city_id = row.get("street"), row.get("city_id")
+    if street or city_id:
+        if not street:
+            errors["street"] = ["This field is required."]
+        try:
+            row["city_id"] = int(city_id)
+        except (TypeError, ValueError):
+            errors["city_id"] = ["A valid integer is required."]
+        else:
+            if row["city_id"] not in city_ids:
+                errors["city_id"] = [f'Invalid pk "{city_id}" - object does not exist.']
+
+    return errors
+
+
+class CustomerImport:
+    """Import customers and addresses from an uploaded file in batches.
+
+    Each row holds one customer and optionally one address. Rows that repeat
+    an email, in any case, add further addresses to the customer created by
+    the first one.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.customers = 0
+        self.addresses = 0
+        self.error_count = 0
+        self.errors = []
+        self.customer_ids = {}
+
+    def add_error(self, row_number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "errors": errors})
+
+    def run(self, upload):
+        city_ids = get_geography().cities.keys()
+        rows = read_rows(upload)
+
+        while chunk := list(islice(rows, CHUNK_SIZE)):
+            self.rows += len(chunk)
+            valid = []
+            for row_number, row in chunk:
+                errors = validate_row(row, city_ids)
+                if errors:
+                    self.add_error(row_number, errors)
+                else:
+                    valid.append((row_number, row))
+            self.import_chunk(valid)
+
+        return self.summary()
+
+    def import_chunk(self, valid):
+        new_emails = {
+            row["email"]
+            for _, row in valid
+            if row["email"].lower() not in self.customer_ids
+        }
+        existing = set(Customer.objects.ids_by_email(new_emails))
+
+        customers = {}
+        addresses = []
+        row_numbers = []
+        for row_number, row in valid:
+            email = row["email"].lower()
+            if email in existing:
+                self.add_error(
+                    row_number, {"email": ["customer with this email already exists."]}
+                )
+                continue
+            row_numbers.append(row_number)
+            if email not in self.customer_ids and email not in customers:
+                customers[email] = Customer(
+                    name=row["name"], email=row["email"], phone=row.get("phone") or None
+                )
+            if row.get("street"):
+                addresses.append((email, row))
+
+        try:
+            with transaction.atomic():
+                created_ids = self.save_chunk(customers, addresses)
+        except IntegrityError:
+            # e.g. a customer created with one of these emails meanwhile
+            for row_number in row_numbers:
+                self.add_error(
+                    row_number,
+                    {"non_field_errors": ["This row conflicts with existing data."]},
+                )
+            return
+
+        self.customer_ids.update(created_ids)
+        self.customers += len(customers)
+        self.addresses += len(addresses)
+
+    def save_chunk(self, customers, addresses):
+        """Insert a chunk's customers and addresses, return the new customer ids"""
+        Customer.objects.bulk_create(customers.values(), batch_size=BATCH_SIZE)
+        created_ids = Customer.objects.ids_by_email(
+            customer.email for customer in customers.values()
+        )
+        customer_ids = {**self.customer_ids, **created_ids}
+
+        # Customers from earlier chunks may gain addresses in this one
+        earlier_ids = {
+            customer_ids[email] for email, _ in addresses if email not in customers
+        }
+        with stats.track_customers(earlier_ids):
+            Address.objects.bulk_create(
+                [
+                    Address(
+                        customer_id=customer_ids[email],
+                        street=row["street"],
+                        city_id=row["city_id"],
+                        zip_code=row.get("zip_code") or None,
+                    )
+                    for email, row in addresses
+                ],
+                batch_size=BATCH_SIZE,
+            )
+        stats.customers_created(created_ids.values())
+        touch_customers(earlier_ids)
+        return created_ids
+
+    def summary(self):
+        return {
+            "rows": self.rows,
+            "customers_created": self.customers,
+            "addresses_created": self.addresses,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
@@ -0,0 +1,251 @@
+import json
+import logging
+import random
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# The metrics of the request being measured, if any
+_current = ContextVar("request_metrics", default=None)
+
+# Repeated statements longer than this are cut short in the log
+MAX_LOGGED_SQL = 300
+
+
+def _freeze(params):
+    if isinstance(params, (list, tuple)):
+        return tuple(params)
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return params
+
+
+class RequestMetrics:
+    """What one request spent, and where: filled in by PerformanceMiddleware.
+
+    It is also the ``execute_wrapper`` of the database connections during
+    the request, so every query is counted and timed.
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.timings = Counter()
+        # How often each statement ran, and each statement with its params
+        self.statements = Counter()
+        self.executions = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+            if not many:
+                try:
+                    self.executions[sql, _freeze(params)] += 1
+                except TypeError:
+                    pass
+
+    @property
+    def duplicate_queries(self):
+        """Queries that repeated an earlier one exactly, params included"""
+        return sum(count - 1 for count in self.executions.values())
+
+    def repeated_statements(self, threshold):
+        """``(count, sql)`` of the statements run at least ``threshold`` times.
+
+        The same statement with different params over and over is what an
+        N+1 looks like, e.g. a related object loaded per serialized row.
+        """
+        return [
+            (count, sql)
+            for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name`` timing"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += perf_counter() - started
+
+
+# Set while a timed serializer runs, so nested ones aren't counted twice
+_serializing = ContextVar("serializing", default=False)
+
+
+class TimedSerializerMixin:
+    """Add the serializer's to_representation() to the "serialize" timing.
+
+    For the project's own serializers; a list of them adds up the time of
+    each item, and nested ones are part of the outermost one's time.
+    """
+
+    def to_representation(self, instance):
+        if _current.get() is None or _serializing.get():
+            return super().to_representation(instance)
+        token = _serializing.set(True)
+        try:
+            with timed("serialize"):
+                return super().to_representation(instance)
+        finally:
+            _serializing.reset(token)
+
+
+def _wrap_connections(metrics):
+    """Pass this thread's queries through ``metrics``; close the stack to stop"""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(metrics))
+    return stack
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _response_size(response):
+    if not response.streaming:
+        return len(response.content)
+    if response.has_header("Content-Length"):
+        return int(response["Content-Length"])
+    return None
+
+
+class PerformanceMiddleware:
+    """Measure a sample of requests and report the numbers.
+
+    Not loaded unless PERFORMANCE_INSTRUMENTATION is set; then a fraction
+    PERFORMANCE_SAMPLE_RATE of the requests is measured: wall time, number
+    and total time of queries, duplicate and repeated queries, time spent
+    in the project's serializers (see TimedSerializerMixin) and rendering,
+    and response size. They are returned in a ``Server-Timing`` header and
+    logged as one JSON line, at WARNING when a statement ran
+    PERFORMANCE_REPEATED_QUERY_THRESHOLD times or more.
+    Requests that aren't sampled only pay for a random() call, and async
+    requests stay async.
+
+    Serialization and rendering time include any queries they trigger. The
+    body of a streaming response isn't produced yet when the numbers are
+    taken, so it isn't part of them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if random.random() >= settings.PERFORMANCE_SAMPLE_RATE:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with _wrap_connections(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self.report(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.PERFORMANCE_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            # Queries run in the request's sync_to_async thread, with its
+            # own connections
+            stack = await sync_to_async(_wrap_connections)(metrics)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current.reset(token)
+
+        self.report(request, response, metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        metrics = _current.get()
+        if metrics is not None:
+            started = perf_counter()
+
+            def rendered(response):
+                metrics.timings["render"] += perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def report(self, request, response, metrics):
+        total = perf_counter() - metrics.started
+        repeated = metrics.repeated_statements(
+            settings.PERFORMANCE_REPEATED_QUERY_THRESHOLD
+        )
+        size = _response_size(response)
+
+        server_timing = [
+            f"total;dur={_ms(total)}",
+            f'db;dur={_ms(metrics.sql_time)};desc="{metrics.queries} queries"',
+            *(
+                f"{name};dur={_ms(seconds)}"
+                for name, seconds in metrics.timings.items()
+            ),
+        ]
+        if metrics.duplicate_queries:
+            server_timing.append(f'dup;desc="{metrics.duplicate_queries} duplicate"')
+        response["Server-Timing"] = ", ".join(server_timing)
+
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": _ms(total),
+            "queries": metrics.queries,
+            "db_ms": _ms(metrics.sql_time),
+            "duplicate_queries": metrics.duplicate_queries,
+            **{f"{name}_ms": _ms(seconds) for name, seconds in metrics.timings.items()},
+            "response_bytes": size,
+        }
+        if repeated:
+            record["repeated_queries"] = [
+                {"count": count, "sql": sql[:MAX_LOGGED_SQL]} for count, sql in repeated
+            ]
+        logger.log(
+            logging.WARNING if repeated else logging.INFO,
+            json.dumps(record),
+            extra={"performance": record},
+        )
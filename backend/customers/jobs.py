@@ -0,0 +1,98 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+_executor = None
+
+
+def register(kind):
+    """Register the function that runs jobs of the given kind"""
+
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.JOB_WORKERS, thread_name_prefix="jobs"
+        )
+    return _executor
+
+
+def enqueue(job):
+    """Run ``job`` on the worker pool once the current transaction commits"""
+    if settings.JOBS_EAGER:
+        run_job(job.pk)
+    else:
+        transaction.on_commit(lambda: get_executor().submit(run_job, job.pk))
+    return job
+
+
+def fail_abandoned(jobs):
+    """Mark the ``jobs`` pending or running for longer than JOB_TIMEOUT as failed.
+
+    The worker pool lives in the web process, so jobs that were queued or
+    running when it stopped are never picked up again.
+    """
+    now = timezone.now()
+    jobs.filter(
+        status__in=[BackgroundJob.Status.PENDING, BackgroundJob.Status.RUNNING],
+        created_at__lt=now - settings.JOB_TIMEOUT,
+    ).update(
+        status=BackgroundJob.Status.FAILED,
+        error="Abandoned: the job did not finish in time",
+        finished_at=now,
+    )
+
+
+def set_progress(job, progress, total=None):
+    job.progress = progress
+    fields = {"progress": progress}
+    if total is not None:
+        job.total = fields["total"] = total
+    BackgroundJob.objects.filter(pk=job.pk).update(**fields)
+
+
+def run_job(job_id):
+    if not settings.JOBS_EAGER:
+        close_old_connections()
+
+    job = BackgroundJob.objects.get(pk=job_id)
+    job.status = BackgroundJob.Status.RUNNING
+    job.save(update_fields=["status"])
+
+    try:
+        HANDLERS[job.kind](job)
+        job.status = BackgroundJob.Status.COMPLETED
+    except Exception as exc:
+        logger.exception("Background job %s failed", job.pk)
+        job.status = BackgroundJob.Status.FAILED
+        job.error = str(exc)
+    finally:
+        job.finished_at = timezone.now()
+        job.save(
+            update_fields=[
+                "status",
+                "progress",
+                "total",
+                "file_path",
+                "error",
+                "finished_at",
+            ]
+        )
+        if not settings.JOBS_EAGER:
+            connection.close()
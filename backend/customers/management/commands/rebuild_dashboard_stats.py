@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from customers.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recomputes the dashboard customer counts from scratch"
+
+    def handle(self, *args, **kwargs):
+        rows = rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {len(rows)} dashboard stat rows")
+        )
@@ -1,5 +1,8 @@
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from customers.models import Country, State, City
+from customers.synthetic import BATCH_SIZE, MAX_COUNTRIES, SyntheticData
 
 DATA = [
     {
@@ -23,9 +26,32 @@ DATA = [
 
 
 class Command(BaseCommand):
-    help = "Seeds the database with countries, states, and cities"
+    help = (
+        "Seeds the database with countries, states, and cities, and optionally "
+        "with deterministic synthetic geography and customers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--countries",
+            type=int,
+            default=0,
+            help=f"synthetic countries to add (at most {MAX_COUNTRIES})",
+        )
+        parser.add_argument("--states-per-country", type=int, default=10)
+        parser.add_argument("--cities-per-state", type=int, default=10)
+        parser.add_argument(
+            "--customers",
+            type=int,
+            default=0,
+            help="synthetic customers to add, spread over the synthetic cities "
+            "or, without --countries, over every city",
+        )
+        parser.add_argument("--addresses-per-customer", type=int, default=2)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS("Seeding database..."))
 
         for entry in DATA:
@@ -42,4 +68,34 @@ class Command(BaseCommand):
                 for city_name in state_data["cities"]:
                     City.objects.get_or_create(name=city_name, state=state)
 
+        data = SyntheticData(seed=options["seed"], batch_size=options["batch_size"])
+        if options["countries"] > MAX_COUNTRIES:
+            raise CommandError(f"At most {MAX_COUNTRIES} synthetic countries")
+        if options["countries"]:
+            city_ids = data.geography(
+                options["countries"],
+                options["states_per_country"],
+                options["cities_per_state"],
+            )
+            self.stdout.write(f"{len(city_ids)} synthetic cities")
+        else:
+            city_ids = list(City.objects.order_by("id").values_list("id", flat=True))
+
+        count = options["customers"]
+        if count:
+            started = time.perf_counter()
+            created = data.customers(
+                count,
+                options["addresses_per_customer"],
+                city_ids,
+                on_batch=lambda done: self.stdout.write(
+                    f"\r{done}/{count} customers", ending=""
+                ),
+            )
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"\nCreated {created} customers in {elapsed:.1f}s "
+                f"({count / elapsed:,.0f} rows/s)"
+            )
+
         self.stdout.write(self.style.SUCCESS("Successfully seeded database!"))
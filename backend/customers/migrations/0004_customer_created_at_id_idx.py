@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0003_backgroundjob"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(
+                fields=["created_at", "id"], name="customer_created_at_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# MySQL gets a FULLTEXT index on name/email. SQLite, used for local
+# development, gets an external-content FTS5 table kept in sync by triggers.
+# Note that SQLite drops the triggers whenever a migration rebuilds
+# customers_customer; recreate them here if that ever happens.
+
+MYSQL_FORWARD = [
+    "CREATE FULLTEXT INDEX customer_search_ft ON customers_customer (name, email)",
+]
+MYSQL_REVERSE = [
+    "DROP INDEX customer_search_ft ON customers_customer",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE customers_customer_fts USING fts5(
+        name, email, content='customers_customer', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER customers_customer_fts_insert AFTER INSERT ON customers_customer
+    BEGIN
+        INSERT INTO customers_customer_fts (rowid, name, email)
+        VALUES (new.id, new.name, new.email);
+    END
+    """,
+    """
+    CREATE TRIGGER customers_customer_fts_delete AFTER DELETE ON customers_customer
+    BEGIN
+        INSERT INTO customers_customer_fts (customers_customer_fts, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+    END
+    """,
+    """
+    CREATE TRIGGER customers_customer_fts_update AFTER UPDATE ON customers_customer
+    BEGIN
+        INSERT INTO customers_customer_fts (customers_customer_fts, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+        INSERT INTO customers_customer_fts (rowid, name, email)
+        VALUES (new.id, new.name, new.email);
+    END
+    """,
+    "INSERT INTO customers_customer_fts (customers_customer_fts) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS customers_customer_fts_insert",
+    "DROP TRIGGER IF EXISTS customers_customer_fts_delete",
+    "DROP TRIGGER IF EXISTS customers_customer_fts_update",
+    "DROP TABLE IF EXISTS customers_customer_fts",
+]
+
+STATEMENTS = {
+    "mysql": (MYSQL_FORWARD, MYSQL_REVERSE),
+    "sqlite": (SQLITE_FORWARD, SQLITE_REVERSE),
+}
+
+
+def run(direction):
+    def operation(apps, schema_editor):
+        statements = STATEMENTS.get(schema_editor.connection.vendor)
+        if statements:
+            for sql in statements[direction]:
+                schema_editor.execute(sql)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0004_customer_created_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(run(0), run(1)),
+    ]
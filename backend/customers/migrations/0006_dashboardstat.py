@@ -0,0 +1,50 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0005_customer_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DashboardStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[
+                            ("total", "Total"),
+                            ("unassigned", "Unassigned"),
+                            ("country", "Country"),
+                            ("state", "State"),
+                            ("city", "City"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("key_id", models.BigIntegerField(default=0)),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("scope", "key_id"),
+                        name="dashboard_stat_scope_key_unique",
+                    )
+                ],
+            },
+        ),
+    ]
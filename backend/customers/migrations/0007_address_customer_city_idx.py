@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0006_dashboardstat"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="address",
+            index=models.Index(
+                fields=["customer", "city"], name="address_customer_city_idx"
+            ),
+        ),
+    ]
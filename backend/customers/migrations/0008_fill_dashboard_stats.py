@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count, F
+
+# customers.stats only adjusts the stat rows once they exist, so count the
+# customers already in the database here.
+
+
+def fill(apps, schema_editor):
+    Customer = apps.get_model("customers", "Customer")
+    Address = apps.get_model("customers", "Address")
+    DashboardStat = apps.get_model("customers", "DashboardStat")
+
+    rows = [
+        DashboardStat(scope="total", count=Customer.objects.count()),
+        DashboardStat(
+            scope="unassigned",
+            count=Customer.objects.filter(addresses__isnull=True).count(),
+        ),
+    ]
+    for scope, field in [
+        ("city", "city_id"),
+        ("state", "city__state_id"),
+        ("country", "city__state__country_id"),
+    ]:
+        counts = Address.objects.values(key_id=F(field)).annotate(
+            count=Count("customer_id", distinct=True)
+        )
+        rows += [DashboardStat(scope=scope, **values) for values in counts]
+
+    DashboardStat.objects.all().delete()
+    DashboardStat.objects.bulk_create(rows, batch_size=1000)
+
+
+def empty(apps, schema_editor):
+    apps.get_model("customers", "DashboardStat").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0007_address_customer_city_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill, empty),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0008_fill_dashboard_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerSearchIndex",
+            fields=[
+                (
+                    "customer",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_index",
+                        serialize=False,
+                        to="customers.customer",
+                    ),
+                ),
+                ("document", models.TextField(db_column="customers_customer_fts")),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "customers_customer_fts",
+                "managed": False,
+            },
+        ),
+    ]
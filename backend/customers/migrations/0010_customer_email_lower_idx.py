@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:16
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0009_customersearchindex"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(
+                django.db.models.functions.text.Lower("email"),
+                name="customer_email_lower_idx",
+            ),
+        ),
+    ]
@@ -1,4 +1,30 @@
 from django.db import models
+from django.db.models.functions import Lower
+from django.contrib.auth.models import User
+
+
+class CustomerQuerySet(models.QuerySet):
+    def with_emails(self, emails):
+        """Customers whose email is one of ``emails``, ignoring case.
+
+        Imports and upserts treat emails that only differ in case as the
+        same customer on every database, like MySQL's default collation
+        does; customer_email_lower_idx serves the lookup.
+        """
+        return self.alias(email_lower=Lower("email")).filter(
+            email_lower__in={email.lower() for email in emails}
+        )
+
+    def ids_by_email(self, emails):
+        """``{lowercased email: id}`` of the customers with_emails() finds.
+
+        This is how bulk-created rows get their ids, since not every backend
+        returns primary keys from bulk_create().
+        """
+        return {
+            email.lower(): pk
+            for email, pk in self.with_emails(emails).values_list("email", "id")
+        }
 
 
 class Customer(models.Model):
@@ -7,6 +33,16 @@ class Customer(models.Model):
     phone = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CustomerQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"], name="customer_created_at_id_idx"
+            ),
+            models.Index(Lower("email"), name="customer_email_lower_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -29,7 +65,9 @@ class State(models.Model):
     )
 
     def __str__(self):
-        return f"{self.name}, {self.country.name}"
+        from .geography import state_label
+
+        return state_label(self.pk) or f"{self.name}, {self.country.name}"
 
 
 class City(models.Model):
@@ -40,7 +78,9 @@ class City(models.Model):
         verbose_name_plural = "Cities"
 
     def __str__(self):
-        return f"{self.name}, {self.state.name}, {self.state.country.name}"
+        from .geography import city_label
+
+        return city_label(self.pk) or f"{self.name}, {self.state}"
 
 
 class Address(models.Model):
@@ -54,6 +94,87 @@ class Address(models.Model):
 
     class Meta:
         verbose_name_plural = "Addresses"
+        indexes = [
+            models.Index(fields=["customer", "city"], name="address_customer_city_idx")
+        ]
+
+    def __str__(self):
+        from .geography import city_label
+
+        return f"{self.street}, {city_label(self.city_id) or self.city}"
+
+
+class BackgroundJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        COMPLETED = "completed"
+        FAILED = "failed"
+
+    kind = models.CharField(max_length=50)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+    params = models.JSONField(default=dict)
+    cache_key = models.CharField(max_length=64, blank=True, db_index=True)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(blank=True, null=True)
+    file_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        User, blank=True, null=True, on_delete=models.SET_NULL
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
 
     def __str__(self):
-        return f"{self.street}, {self.city.name}, {self.city.state.name}, {self.city.state.country.name}"
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class DashboardStat(models.Model):
+    """Precomputed customer counts, maintained by customers.stats"""
+
+    class Scope(models.TextChoices):
+        TOTAL = "total"
+        UNASSIGNED = "unassigned"
+        COUNTRY = "country"
+        STATE = "state"
+        CITY = "city"
+
+    scope = models.CharField(max_length=20, choices=Scope.choices)
+    key_id = models.BigIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["scope", "key_id"], name="dashboard_stat_scope_key_unique"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key_id}: {self.count}"
+
+
+class CustomerSearchIndex(models.Model):
+    """SQLite's FTS5 table over customer names and emails (see migration 0005).
+
+    Unmanaged, and only there so searches can join it; MySQL indexes the
+    customer table itself.
+    """
+
+    customer = models.OneToOneField(
+        Customer,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        related_name="search_index",
+        on_delete=models.DO_NOTHING,
+    )
+    # The hidden column named after the table, which MATCH queries target
+    document = models.TextField(db_column="customers_customer_fts")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "customers_customer_fts"
@@ -0,0 +1,165 @@
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CustomerPagination(PageNumberPagination):
+    """Page number pagination with a client page size and an optional count.
+
+    ``?count=false`` skips the ``COUNT(*)`` query: one extra row is fetched to
+    tell whether there is a next page and ``count`` comes back as ``null``.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.skip_count = request.query_params.get(self.count_query_param) == "false"
+        if not self.skip_count:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        page_number = request.query_params.get(self.page_query_param) or 1
+        try:
+            self.page_number = int(page_number)
+        except ValueError:
+            self.page_number = 0
+
+        invalid_page = NotFound(
+            self.invalid_page_message.format(
+                page_number=page_number, message="Invalid page."
+            )
+        )
+        if self.page_number < 1:
+            raise invalid_page
+
+        offset = (self.page_number - 1) * self.page_size
+        rows = list(queryset[offset : offset + self.page_size + 1])
+        if not rows and self.page_number > 1:
+            raise invalid_page
+
+        self.has_next = len(rows) > self.page_size
+        return rows[: self.page_size]
+
+    def get_paginated_response(self, data):
+        if not self.skip_count:
+            return super().get_paginated_response(data)
+
+        return Response(
+            {
+                "count": None,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_next_link(self):
+        if not self.skip_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if not self.skip_count:
+            return super().get_previous_link()
+        if self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+
+class CustomerCursorPagination(CursorPagination):
+    """Keyset pagination on ``(created_at, id)``, backed by a composite index.
+
+    Cursors carry both values of the row they start after, so every page is
+    the same index range scan however deep the client scrolls, rows sharing
+    a ``created_at`` included, and no ``COUNT(*)`` is ever run. DRF's own
+    cursor only keeps the first ordering field and skips ties by OFFSET.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        key = self._decode_position(self.cursor)
+        reverse = bool(self.cursor and self.cursor.reverse)
+
+        if reverse:
+            queryset = queryset.order_by("created_at", "id")
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if key:
+            queryset = queryset.filter(self._beyond(key, reverse))
+
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = key is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, key is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    @staticmethod
+    def _beyond(key, reverse):
+        created_at, pk = key
+        if reverse:
+            return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+
+    def _decode_position(self, cursor):
+        if cursor is None or cursor.position is None:
+            return None
+        try:
+            created_at, pk = cursor.position.rsplit(" ", 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _position(self, row):
+        if isinstance(row, dict):
+            created_at, pk = row["created_at"], row["id"]
+        else:
+            created_at, pk = row.created_at, row.id
+        return f"{created_at.isoformat()} {pk}"
+
+    def _link(self, reverse, row):
+        # An empty page keeps the cursor it was reached with
+        position = self._position(row) if row is not None else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=reverse, position=position))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self._link(False, self.page[-1] if self.page else None)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self._link(True, self.page[0] if self.page else None)
@@ -0,0 +1,63 @@
+from itertools import islice
+
+HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+WRAP_FORMAT = {"text_wrap": True}
+WIDTH_PADDING = 2
+
+
+def chunked(rows, size):
+    """Yield lists of up to ``size`` rows from the iterable ``rows``"""
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def longest(values):
+    """Length of the longest value in ``values`` once written as text.
+
+    Text columns are measured without converting any value, and integer
+    columns only convert their extremes.
+    """
+    try:
+        return max(map(len, values))
+    except TypeError:
+        pass
+    if set(map(type, values)) == {int}:
+        return max(len(str(max(values))), len(str(min(values))))
+    return max(map(len, map(str, values)))
+
+
+class ColumnWidths:
+    """Running maximum length of the values in each column.
+
+    Rows are measured a chunk at a time: the chunk is transposed and each
+    column is measured with builtins, so the per-cell work runs in C instead
+    of a Python loop over every value.
+    """
+
+    def __init__(self, columns):
+        self.widths = [len(column) for column in columns]
+
+    def update(self, rows):
+        if not rows:
+            return
+        self.widths = [
+            max(width, longest(values))
+            for width, values in zip(self.widths, zip(*rows))
+        ]
+
+    def merge(self, widths):
+        self.widths = [max(pair) for pair in zip(self.widths, widths)]
+
+
+class WorkbookFormats:
+    """The report's cell formats, added to the workbook once and shared"""
+
+    def __init__(self, workbook):
+        self.header = workbook.add_format(HEADER_FORMAT)
+        self.wrap = workbook.add_format(WRAP_FORMAT)
+
+    def set_columns(self, worksheet, columns, widths, wrapped_columns=()):
+        for idx, column in enumerate(columns):
+            cell_format = self.wrap if column in wrapped_columns else None
+            worksheet.set_column(idx, idx, widths[idx] + WIDTH_PADDING, cell_format)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+
+from ..jobs import enqueue, fail_abandoned, register, set_progress
+from ..models import BackgroundJob
+from .rows import (
+    CHUNK_SIZE,
+    WRAPPED_COLUMNS,
+    iter_report_rows,
+    report_columns,
+    report_queryset,
+)
+from .columnar import COLUMNAR_FILE_TYPES, write_columnar
+from .parallel import use_parallel, write_report_parallel
+from .writers import write_csv, write_xlsx
+
+REPORT_PARAMS = ["country_id", "state_id", "search", "format", "file_type"]
+FILE_TYPES = ["xlsx", "csv", *COLUMNAR_FILE_TYPES]
+
+
+def report_params_error(layout, file_type):
+    """Return the error message for an unsupported layout/file type, if any"""
+    if file_type not in FILE_TYPES:
+        return f"file_type must be one of: {', '.join(FILE_TYPES)}"
+    if file_type in COLUMNAR_FILE_TYPES and layout != "separate_rows":
+        return f"{file_type} reports only support format=separate_rows"
+    return None
+
+
+def normalize_params(data):
+    """Keep the report parameters that affect the output, with defaults applied"""
+    params = {key: str(data[key]) for key in REPORT_PARAMS if data.get(key)}
+    params.setdefault("format", "separate_rows")
+    params.setdefault("file_type", "xlsx")
+    return params
+
+
+def report_cache_key(params):
+    encoded = json.dumps(params, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def find_cached_job(cache_key):
+    """Return a pending, running or fresh completed job for ``cache_key``"""
+    fresh_since = timezone.now() - settings.REPORT_CACHE_TTL
+    jobs = BackgroundJob.objects.filter(kind="report", cache_key=cache_key).order_by(
+        "-created_at"
+    )
+    fail_abandoned(jobs)
+    for job in jobs[:5]:
+        if job.status in [BackgroundJob.Status.PENDING, BackgroundJob.Status.RUNNING]:
+            return job
+        if (
+            job.status == BackgroundJob.Status.COMPLETED
+            and job.finished_at >= fresh_since
+            and os.path.exists(job.file_path)
+        ):
+            return job
+    return None
+
+
+def start_report_job(data, user=None):
+    """Return ``(job, created)`` for the report described by ``data``.
+
+    Invalid filters raise ValidationError here, like on the customer list,
+    rather than failing the job in the background.
+    """
+    params = normalize_params(data)
+    filtered_customers(params)
+    cache_key = report_cache_key(params)
+
+    job = find_cached_job(cache_key)
+    if job:
+        return job, False
+
+    job = BackgroundJob.objects.create(
+        kind="report",
+        params=params,
+        cache_key=cache_key,
+        created_by_id=getattr(user, "id", None),
+    )
+    return enqueue(job), True
+
+
+def filtered_customers(params):
+    """Apply CustomerViewSet's filtering to ``params`` outside of a request"""
+    from ..views.customer import filtered_customers
+
+    http_request = HttpRequest()
+    http_request.method = "GET"
+    http_request.GET = QueryDict(urlencode(params))
+    return filtered_customers(http_request, action="generate_report")
+
+
+def track_progress(rows, job):
+    for count, row in enumerate(rows, start=1):
+        if count % CHUNK_SIZE == 0:
+            set_progress(job, count)
+        yield row
+    set_progress(job, job.total or 0)
+
+
+@register("report")
+def generate_report_file(job):
+    params = job.params
+    layout = params["format"]
+    file_type = params["file_type"]
+    customers = filtered_customers(params)
+
+    row_count = report_queryset(customers).count()
+    set_progress(job, 0, row_count)
+    columns = report_columns(layout)
+    wrapped_columns = WRAPPED_COLUMNS if layout == "combined" else ()
+
+    os.makedirs(settings.REPORTS_ROOT, exist_ok=True)
+    path = os.path.join(settings.REPORTS_ROOT, f"{job.cache_key}-{job.pk}.{file_type}")
+    if file_type in COLUMNAR_FILE_TYPES:
+        write_columnar(
+            path, customers, file_type, on_progress=lambda done: set_progress(job, done)
+        )
+    elif use_parallel(row_count):
+        write_report_parallel(
+            path,
+            customers,
+            layout,
+            file_type,
+            columns,
+            wrapped_columns,
+            on_progress=lambda done: set_progress(job, done),
+        )
+        set_progress(job, job.total or 0)
+    elif file_type == "csv":
+        rows = track_progress(iter_report_rows(customers, layout), job)
+        with open(path, "w", newline="", encoding="utf-8") as output:
+            write_csv(output, columns, rows)
+    else:
+        rows = track_progress(iter_report_rows(customers, layout), job)
+        write_xlsx(path, columns, rows, wrapped_columns)
+    job.file_path = path
+
+    # Older artifacts for the same parameters are superseded by this one
+    stale = BackgroundJob.objects.filter(
+        kind="report", cache_key=job.cache_key, status=BackgroundJob.Status.COMPLETED
+    ).exclude(pk=job.pk)
+    for stale_job in stale:
+        if os.path.exists(stale_job.file_path):
+            os.remove(stale_job.file_path)
+    stale.update(file_path="")
@@ -0,0 +1,153 @@
+import csv
+import math
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.db.models import Q
+
+from ..models import Customer
+from .formatting import ColumnWidths, chunked
+from .rows import CHUNK_SIZE, iter_report_rows, report_columns
+from .writers import write_xlsx
+
+
+def use_parallel(row_count):
+    return (
+        settings.REPORT_WORKERS > 1 and row_count >= settings.REPORT_PARALLEL_MIN_ROWS
+    )
+
+
+def shard_bounds(customers, shards):
+    """Cut ``customers`` into up to ``shards`` runs of consecutive report rows.
+
+    Reports are ordered by ``(-created_at, -id)``, so each run is described
+    by the ``(created_at, id)`` of its first customer, read with one indexed
+    OFFSET query per shard.
+    """
+    ordered = customers.order_by("-created_at", "-id").values_list("created_at", "id")
+    total = customers.count()
+    if not total:
+        return []
+    size = math.ceil(total / shards)
+    return [ordered[start] for start in range(0, total, size)]
+
+
+def _from(key):
+    """Customers at or after ``key`` in report order"""
+    created_at, pk = key
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lte=pk)
+
+
+def build_shard(query, layout, file_type, start, end, path):
+    """Write one shard's rows to ``path`` and return ``(row_count, widths)``.
+
+    CSV shards hold finished CSV lines, xlsx shards hold pickled chunks of
+    rows for the parent to feed to the workbook. ``widths`` is the longest
+    value per column, which the parent merges to size the xlsx columns.
+    """
+    customers = Customer.objects.all()
+    customers.query = query
+    customers = customers.filter(_from(start))
+    if end is not None:
+        customers = customers.exclude(_from(end))
+    rows = iter_report_rows(customers, layout)
+
+    count = 0
+    if file_type == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as output:
+            writer = csv.writer(output)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        return count, []
+
+    widths = ColumnWidths(report_columns(layout))
+    with open(path, "wb") as output:
+        for chunk in chunked(rows, CHUNK_SIZE):
+            widths.update(chunk)
+            pickle.dump(chunk, output, pickle.HIGHEST_PROTOCOL)
+            count += len(chunk)
+    return count, widths.widths
+
+
+def _read_shard(path):
+    with open(path, "rb") as shard:
+        while True:
+            try:
+                yield from pickle.load(shard)
+            except EOFError:
+                return
+
+
+def write_report_parallel(
+    output, customers, layout, file_type, columns, wrapped_columns=(), **options
+):
+    """Write a report to ``output``, building its rows in a process pool.
+
+    The rows of each shard are built, and for xlsx measured, in a worker
+    process; the parent then concatenates the shards in order into a single
+    file. ``output`` is a path, or for xlsx also a binary file object. Pass
+    ``workers=1`` to build the shards in this process instead.
+    ``on_progress`` is called with the number of rows built so far.
+    """
+    workers = options.get("workers", settings.REPORT_WORKERS)
+    shards = options.get("shards", workers)
+    on_progress = options.get("on_progress")
+
+    bounds = shard_bounds(customers, shards)
+    query = customers.query
+    with tempfile.TemporaryDirectory() as shard_dir:
+        tasks = [
+            (
+                query,
+                layout,
+                file_type,
+                start,
+                bounds[idx + 1] if idx + 1 < len(bounds) else None,
+                os.path.join(shard_dir, f"{idx}.{file_type}"),
+            )
+            for idx, start in enumerate(bounds)
+        ]
+
+        results = {}
+        if workers > 1:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                # A reference to this module would import models before setup
+                initializer=django.setup,
+            ) as pool:
+                futures = {
+                    pool.submit(build_shard, *task): idx
+                    for idx, task in enumerate(tasks)
+                }
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+                    if on_progress:
+                        on_progress(sum(count for count, _ in results.values()))
+        else:
+            for idx, task in enumerate(tasks):
+                results[idx] = build_shard(*task)
+                if on_progress:
+                    on_progress(sum(count for count, _ in results.values()))
+
+        paths = [task[-1] for task in tasks]
+        if file_type == "csv":
+            with open(output, "w", newline="", encoding="utf-8") as report:
+                csv.writer(report).writerow(columns)
+                for path in paths:
+                    with open(path, newline="", encoding="utf-8") as shard:
+                        shutil.copyfileobj(shard, report)
+            return
+
+        widths = ColumnWidths(columns)
+        for _, shard_widths in results.values():
+            widths.merge(shard_widths)
+        rows = (row for path in paths for row in _read_shard(path))
+        write_xlsx(output, columns, rows, wrapped_columns, widths=widths.widths)
@@ -0,0 +1,161 @@
+from collections import defaultdict
+from itertools import chain, groupby
+from operator import itemgetter
+
+from django.db.models import Q
+
+from ..models import Address, Customer
+
+CHUNK_SIZE = 2000
+
+SEPARATE_ROWS_COLUMNS = [
+    "Customer ID",
+    "Name",
+    "Email",
+    "Phone",
+    "Created At",
+    "Address ID",
+    "Street",
+    "City",
+    "State",
+    "Country",
+    "Zip Code",
+]
+
+COMBINED_COLUMNS = [
+    "Customer ID",
+    "Name",
+    "Email",
+    "Phone",
+    "Created At",
+    "Streets",
+    "Cities",
+    "States",
+    "Countries",
+    "Zip Codes",
+]
+
+WRAPPED_COLUMNS = ["Streets", "Cities", "States", "Countries", "Zip Codes"]
+
+
+def report_columns(layout):
+    if layout == "separate_rows":
+        return SEPARATE_ROWS_COLUMNS
+    return COMBINED_COLUMNS
+
+
+REPORT_FIELDS = [
+    "id",
+    "name",
+    "email",
+    "phone",
+    "created_at",
+    "addresses__id",
+    "addresses__street",
+    "addresses__city__name",
+    "addresses__city__state__name",
+    "addresses__city__state__country__name",
+    "addresses__zip_code",
+]
+
+
+CUSTOMER_FIELDS = REPORT_FIELDS[:5]
+ADDRESS_FIELDS = [
+    "customer_id",
+    "id",
+    "street",
+    "city__name",
+    "city__state__name",
+    "city__state__country__name",
+    "zip_code",
+]
+# The address half of the record of a customer without addresses
+NO_ADDRESS = (None,) * (len(ADDRESS_FIELDS) - 1)
+
+
+def report_queryset(queryset):
+    """Flatten the customers in ``queryset`` into one row per address.
+
+    A single LEFT JOIN across Customer -> Address -> City -> State -> Country
+    replaces the per-customer and per-address lookups, and the rows come back
+    ordered by customer so the combined layout can group them on the fly.
+    """
+    customers = Customer.objects.filter(pk__in=queryset.values("pk"))
+    return customers.order_by("-created_at", "-id", "addresses__id").values_list(
+        *REPORT_FIELDS
+    )
+
+
+def _after(customer):
+    """Customers that come after ``customer``, a customer record, in report order"""
+    customer_id, created_at = customer[0], customer[4]
+    # The range on created_at alone lets the index seek past earlier chunks
+    return Q(created_at__lte=created_at) & (
+        Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=customer_id)
+    )
+
+
+def report_record_chunks(queryset, size=CHUNK_SIZE):
+    """Yield the report records of ``queryset``, ``size`` customers at a time.
+
+    Each chunk is a LIMIT query on the ``(created_at, id)`` index starting
+    after the last customer of the previous one, plus one query for the
+    addresses of its customers, so every chunk costs the same and memory
+    stays bounded on every backend; a single query read with iterator() is
+    buffered whole by MySQLdb. The records match ``report_queryset()``.
+    """
+    customers = queryset.order_by("-created_at", "-id").values_list(*CUSTOMER_FIELDS)
+    page = customers
+    while chunk := list(page[:size]):
+        addresses = defaultdict(list)
+        for customer_id, *address in (
+            Address.objects.filter(customer_id__in=[row[0] for row in chunk])
+            .order_by("id")
+            .values_list(*ADDRESS_FIELDS)
+        ):
+            addresses[customer_id].append(tuple(address))
+        yield [
+            customer + address
+            for customer in chunk
+            for address in addresses.get(customer[0], [NO_ADDRESS])
+        ]
+        if len(chunk) < size:
+            return
+        page = customers.filter(_after(chunk[-1]))
+
+
+def _customer_cells(record):
+    customer_id, name, email, phone, created_at = record[:5]
+    return [
+        customer_id,
+        name,
+        email,
+        phone or "",
+        created_at.strftime("%Y-%m-%d %H:%M:%S"),
+    ]
+
+
+def _address_cells(record):
+    address_id, street, city, state, country, zip_code = record[5:]
+    if address_id is None:
+        return ["", "", "", "", "", ""]
+    return [address_id, street, city, state, country, zip_code or ""]
+
+
+def iter_report_rows(queryset, layout):
+    """Yield report rows as lists, reading the records one chunk at a time"""
+    records = chain.from_iterable(report_record_chunks(queryset))
+
+    if layout == "separate_rows":
+        for record in records:
+            yield _customer_cells(record) + _address_cells(record)
+        return
+
+    for _, group in groupby(records, key=itemgetter(0)):
+        group = list(group)
+        addresses = [
+            _address_cells(record)[1:] for record in group if record[5] is not None
+        ]
+        yield _customer_cells(group[0]) + [
+            " | ".join(address[column] for address in addresses) for column in range(5)
+        ]
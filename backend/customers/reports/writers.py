@@ -0,0 +1,64 @@
+import csv
+
+import xlsxwriter
+
+from .formatting import ColumnWidths, WorkbookFormats, chunked
+from .rows import CHUNK_SIZE
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_CONTENT_TYPE = "text/csv"
+
+
+class Echo:
+    """File-like object that hands back whatever is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    """Yield the report as CSV, one encoded line at a time"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_csv(output, columns, rows):
+    """Write the report as CSV to the text file object ``output``"""
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    writer.writerows(rows)
+
+
+def write_xlsx(output, columns, rows, wrapped_columns=(), widths=None):
+    """Write the report as xlsx to ``output``, a path or binary file object.
+
+    The workbook runs in ``constant_memory`` mode, so each row is flushed to
+    disk as soon as the next one starts and memory stays flat regardless of
+    the number of rows. Pass ``widths``, the longest value per column, when
+    it is already known to skip measuring every cell.
+    """
+    workbook = xlsxwriter.Workbook(
+        output,
+        {
+            "constant_memory": True,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        },
+    )
+    worksheet = workbook.add_worksheet("Customers")
+    formats = WorkbookFormats(workbook)
+
+    measured = ColumnWidths(columns)
+    worksheet.write_row(0, 0, columns, formats.header)
+    row_idx = 1
+    for chunk in chunked(rows, CHUNK_SIZE):
+        for row in chunk:
+            worksheet.write_row(row_idx, 0, row)
+            row_idx += 1
+        if widths is None:
+            measured.update(chunk)
+
+    formats.set_columns(worksheet, columns, widths or measured.widths, wrapped_columns)
+    workbook.close()
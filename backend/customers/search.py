@@ -0,0 +1,206 @@
+import re
+from contextlib import contextmanager
+from functools import reduce
+from operator import and_, or_
+from string import ascii_lowercase, digits
+
+from django.db import connections
+from django.db.models import F, FloatField, Func, Lookup, Q
+from rest_framework import filters
+
+from .models import CustomerSearchIndex
+
+FTS_TABLE = CustomerSearchIndex._meta.db_table
+FTS_INSERT_TRIGGER = "customers_customer_fts_insert"
+
+# Shorter words have too many neighbours one typo away to correct them
+MIN_FUZZY_LENGTH = 4
+FUZZY_ALPHABET = ascii_lowercase + digits
+
+# MySQL only indexes words of innodb_ft_min_token_size (3) or more
+MYSQL_MIN_TOKEN_LENGTH = 3
+
+_fts_tables = {}
+
+
+def tokenize(terms):
+    """Split search terms into the word characters the full-text index keeps"""
+    return [token for term in terms for token in re.findall(r"\w+", term.lower())]
+
+
+def one_typo_away(token):
+    """``token`` and the words one deletion, swap, substitution or insertion away.
+
+    Words are matched by prefix, so words starting with a shorter one in
+    the list, like insertions at the end, are left out.
+    """
+    splits = [(token[:i], token[i:]) for i in range(len(token))]
+    words = {token}
+    for head, tail in splits:
+        words.add(head + tail[1:])
+        if len(tail) > 1:
+            words.add(head + tail[1] + tail[0] + tail[2:])
+        for char in FUZZY_ALPHABET:
+            words.add(head + char + tail[1:])
+            words.add(head + char + tail)
+
+    prefixes = []
+    for word in sorted(words):
+        if not prefixes or not word.startswith(prefixes[-1]):
+            prefixes.append(word)
+    return prefixes
+
+
+def _has_fts_table(connection):
+    if connection.alias not in _fts_tables:
+        _fts_tables[connection.alias] = (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_tables[connection.alias]
+
+
+@contextmanager
+def bulk_indexing(connection, first_id):
+    """Index the customers inserted in the block, from ``first_id`` on, at once.
+
+    SQLite's per-row FTS5 insert trigger is several times slower than one
+    INSERT ... SELECT, so the trigger is dropped for the duration of the
+    block and recreated from its stored definition. Use it inside a
+    transaction. Other databases keep their index up to date themselves.
+    """
+    if connection.vendor != "sqlite" or not _has_fts_table(connection):
+        yield
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = %s",
+            [FTS_INSERT_TRIGGER],
+        )
+        trigger = cursor.fetchone()
+        if trigger is None:
+            yield
+            return
+
+        cursor.execute(f"DROP TRIGGER {FTS_INSERT_TRIGGER}")
+        yield
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, email) "
+            "SELECT id, name, email FROM customers_customer WHERE id >= %s",
+            [first_id],
+        )
+        cursor.execute(trigger[0])
+
+
+class Match(Func):
+    """MySQL ``MATCH (name, email) AGAINST (... IN BOOLEAN MODE)`` relevance"""
+
+    output_field = FloatField()
+
+    def __init__(self, expression):
+        super().__init__(F("name"), F("email"))
+        self.expression = expression
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(
+            compiler, connection, template="MATCH (%(expressions)s)"
+        )
+        return f"{sql} AGAINST (%s IN BOOLEAN MODE)", (*params, self.expression)
+
+
+def _mysql_search(queryset, words):
+    # Words in parentheses are alternatives, of which one must match
+    expression = " ".join(
+        "+({})".format(" ".join(f"{word}*" for word in alternatives))
+        for alternatives in words
+    )
+    return (
+        queryset.annotate(search_rank=Match(expression))
+        .filter(search_rank__gt=0)
+        .order_by("-search_rank", *queryset.query.order_by)
+    )
+
+
+@CustomerSearchIndex._meta.get_field("document").register_lookup
+class FTSMatch(Lookup):
+    """SQLite FTS5 ``MATCH`` against the table's hidden column of the same name"""
+
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", (*lhs_params, *rhs_params)
+
+
+def _sqlite_search(queryset, words):
+    expression = " AND ".join(
+        "({})".format(" OR ".join(f'"{word}"*' for word in alternatives))
+        for alternatives in words
+    )
+    # Joining the FTS5 table runs the MATCH once and orders by its rank; a
+    # correlated bm25() per row would re-run the MATCH for every customer
+    return queryset.filter(search_index__document__match=expression).order_by(
+        F("search_index__rank"), *queryset.query.order_by
+    )
+
+
+def _contains_search(queryset, tokens):
+    return queryset.filter(
+        reduce(
+            and_,
+            (
+                reduce(or_, [Q(name__icontains=token), Q(email__icontains=token)])
+                for token in tokens
+            ),
+        )
+    )
+
+
+def _full_text_search(queryset, tokens):
+    """The full-text search function for ``queryset``'s database, if it has one"""
+    connection = connections[queryset.db]
+    if connection.vendor == "mysql" and all(
+        len(token) >= MYSQL_MIN_TOKEN_LENGTH for token in tokens
+    ):
+        return _mysql_search
+    if connection.vendor == "sqlite" and _has_fts_table(connection):
+        return _sqlite_search
+    return None
+
+
+def search_customers(queryset, terms):
+    """Filter customers matching every term by word prefix, best match first.
+
+    Uses the full-text index of the database (MySQL FULLTEXT, SQLite FTS5)
+    and falls back to ``icontains`` elsewhere. On the full-text indexes,
+    when nothing matches, the search is retried accepting one typo (a
+    missing, extra, swapped or wrong character) in each word of at least
+    MIN_FUZZY_LENGTH characters.
+    """
+    tokens = tokenize(terms)
+    if not tokens:
+        return queryset
+
+    search = _full_text_search(queryset, tokens)
+    if search is None:
+        return _contains_search(queryset, tokens)
+
+    results = search(queryset, [[token] for token in tokens])
+    fuzzy = [
+        one_typo_away(token) if len(token) >= MIN_FUZZY_LENGTH else [token]
+        for token in tokens
+    ]
+    if any(len(words) > 1 for words in fuzzy) and not results.exists():
+        results = search(queryset, fuzzy)
+    return results
+
+
+class CustomerSearchFilter(filters.SearchFilter):
+    """SearchFilter backed by the customer full-text index"""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_customers(queryset, terms)
@@ -1,15 +1,24 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt import serializers as jwt_serializers
+from django.urls import reverse
 from django.contrib.auth.models import User
-from .models import Customer, Address, City, State, Country
+from django.db import transaction
+from . import stats
+from .address_sync import AddressChanges, UnknownAddress
+from .blacklist import CachedBlacklistRefreshToken
+from .geography import get_city
+from .instrumentation import TimedSerializerMixin, timed
+from .models import Customer, Address, City, State, Country, BackgroundJob
 
 
-class CountrySerializer(serializers.ModelSerializer):
+class CountrySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Country
         fields = "__all__"
 
 
-class StateSerializer(serializers.ModelSerializer):
+class StateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     country = CountrySerializer()
 
     class Meta:
@@ -17,7 +26,7 @@ class StateSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class CitySerializer(serializers.ModelSerializer):
+class CitySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     state = StateSerializer()
 
     class Meta:
@@ -25,7 +34,8 @@ class CitySerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class AddressSerializer(serializers.ModelSerializer):
+class AddressSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
     city = serializers.PrimaryKeyRelatedField(
         queryset=City.objects.all(), write_only=True
     )
@@ -33,60 +43,206 @@ class AddressSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Address
-        fields = ["street", "city", "zip_code", "city_detail"]
+        fields = ["id", "street", "city", "zip_code", "city_detail"]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+
+        # The nested city is only rendered for GET, so don't load it otherwise
+        if not (request and request.method in ["GET"]):
+            fields.pop("city_detail")
+
+        return fields
+
+    def create(self, validated_data):
+        # ``id`` only identifies addresses nested in a customer update
+        validated_data.pop("id", None)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        validated_data.pop("id", None)
+        return super().update(instance, validated_data)
 
     def get_city_detail(self, obj):
-        return CitySerializer(obj.city).data
+        return get_city(obj.city_id)
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        request = self.context.get("request")
 
-        if request and request.method in ["GET"]:
+        if "city_detail" in data:
             data["city"] = data.pop("city_detail")
-        else:
-            data.pop("city_detail", None)
 
         return data
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     addresses = AddressSerializer(many=True)
 
     class Meta:
         model = Customer
         fields = "__all__"
 
+    @transaction.atomic
     def create(self, validated_data):
-        addresses_data = validated_data.pop("addresses", [])
+        # A new customer's addresses are all new, whatever ids they carry
+        addresses_data = [
+            {key: value for key, value in address.items() if key != "id"}
+            for address in validated_data.pop("addresses", [])
+        ]
         customer = Customer.objects.create(**validated_data)
 
-        for address_data in addresses_data:
-            city_instance = address_data.pop("city")  # Extract city instance
-            Address.objects.create(
-                customer=customer, city=city_instance, **address_data
-            )
+        with stats.track_customers([customer.id]):
+            AddressChanges().plan(customer.id, [], addresses_data).apply()
 
         return customer
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        addresses_data = validated_data.pop("addresses", [])
+        addresses_data = validated_data.pop("addresses", None)
         instance.name = validated_data.get("name", instance.name)
         instance.email = validated_data.get("email", instance.email)
         instance.phone = validated_data.get("phone", instance.phone)
         instance.save()
 
-        instance.addresses.all().delete()
-        for address_data in addresses_data:
-            city_instance = address_data.pop("city")
-            Address.objects.create(
-                customer=instance, city=city_instance, **address_data
-            )
+        if addresses_data is not None:
+            try:
+                changes = AddressChanges().plan(
+                    instance.id, list(instance.addresses.all()), addresses_data
+                )
+            except UnknownAddress as exc:
+                raise serializers.ValidationError({"addresses": [str(exc)]})
+            with stats.track_customers([instance.id]):
+                changes.apply()
 
         return instance
 
 
-class UserSerializer(serializers.ModelSerializer):
+def _datetime_formatter():
+    """DateTimeField().to_representation, with the time zone looked up once"""
+    field = serializers.DateTimeField()
+    tz = field.default_timezone()
+    if tz is None or api_settings.DATETIME_FORMAT != ISO_8601:
+        return field.to_representation
+
+    def to_representation(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return to_representation
+
+
+class CustomerRowSerializer:
+    """CustomerSerializer's GET output, built from flat ``values()`` rows.
+
+    ``customers`` are dicts with CUSTOMER_FIELDS; their addresses are read
+    with one ``values_list()`` query and their cities come from the
+    geography index. Keys are emitted in CustomerSerializer's order, so the
+    rendered JSON is the same byte for byte, without instantiating models or
+    running a field per value.
+    """
+
+    customer_fields = ["id", "name", "email", "phone", "created_at"]
+    address_fields = ["customer_id", "id", "street", "zip_code", "city_id"]
+
+    def __init__(self, customers):
+        self.customers = customers
+
+    @property
+    @timed("serialize")
+    def data(self):
+        addresses = {row["id"]: [] for row in self.customers}
+        for customer_id, pk, street, zip_code, city_id in (
+            Address.objects.filter(customer_id__in=addresses.keys())
+            .order_by("id")
+            .values_list(*self.address_fields)
+        ):
+            addresses[customer_id].append(
+                {
+                    "id": pk,
+                    "street": street,
+                    "zip_code": zip_code,
+                    "city": get_city(city_id),
+                }
+            )
+
+        created_at = _datetime_formatter()
+        return [
+            {
+                "id": row["id"],
+                "addresses": addresses[row["id"]],
+                "name": row["name"],
+                "email": row["email"],
+                "phone": row["phone"],
+                "created_at": created_at(row["created_at"]),
+            }
+            for row in self.customers
+        ]
+
+
+class BulkAddressSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    street = serializers.CharField(max_length=255)
+    city = serializers.IntegerField()
+    zip_code = serializers.CharField(
+        max_length=20, required=False, allow_blank=True, allow_null=True
+    )
+
+
+class BulkCustomerSerializer(serializers.Serializer):
+    """One item of a bulk upsert; emails and cities are checked per batch"""
+
+    name = serializers.CharField(max_length=255)
+    email = serializers.EmailField(max_length=254)
+    phone = serializers.CharField(
+        max_length=20, required=False, allow_blank=True, allow_null=True
+    )
+    addresses = BulkAddressSerializer(many=True, required=False)
+
+
+class BackgroundJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    params = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BackgroundJob
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "params",
+            "progress",
+            "total",
+            "error",
+            "created_at",
+            "finished_at",
+            "download_url",
+        ]
+
+    def get_params(self, obj):
+        # A bulk delete's id list can be huge; only its size is shown
+        params = dict(obj.params)
+        if "customer_ids" in params:
+            params["customer_count"] = len(params.pop("customer_ids"))
+        return params
+
+    def get_download_url(self, obj):
+        if obj.status != BackgroundJob.Status.COMPLETED or not obj.file_path:
+            return None
+        url = reverse("backgroundjob-download", args=[obj.pk])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "username", "first_name", "last_name"]
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """TokenRefreshSerializer checking the blacklist through its in-memory set"""
+
+    token_class = CachedBlacklistRefreshToken
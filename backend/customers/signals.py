@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import stats
+from .conditional import touch_customers
+from .geography import invalidate_geography
+from .models import Country, State, City, Customer, Address
+
+
+@receiver([post_save, post_delete], sender=Country)
+@receiver([post_save, post_delete], sender=State)
+@receiver([post_save, post_delete], sender=City)
+def geography_changed(sender, **kwargs):
+    invalidate_geography()
+    # Drop anything another request cached from the pre-commit rows too
+    transaction.on_commit(invalidate_geography)
+
+
+@receiver([pre_save, pre_delete], sender=Address)
+def address_changing(sender, instance, **kwargs):
+    stats.capture(instance.customer_id)
+
+
+@receiver([post_save, post_delete], sender=Address)
+def address_changed(sender, instance, **kwargs):
+    stats.changed(instance.customer_id)
+
+
+@receiver([post_save, post_delete], sender=Address)
+def address_touched(sender, instance, **kwargs):
+    touch_customers([instance.customer_id])
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def customer_touched(sender, instance, **kwargs):
+    touch_customers([instance.pk])
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.customers_created([instance.pk])
+
+
+@receiver(pre_delete, sender=Customer)
+def customer_deleting(sender, instance, **kwargs):
+    stats.capture(instance.pk)
+
+
+@receiver(post_delete, sender=Customer)
+def customer_deleted(sender, instance, **kwargs):
+    # Cascaded address deletes may have applied the snapshot already, leaving
+    # a customer without addresses
+    stats.changed(instance.pk, default=frozenset())
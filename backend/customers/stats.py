@@ -0,0 +1,229 @@
+import threading
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, F
+
+from .geography import aget_geography, get_geography
+from .models import Customer, Address, DashboardStat
+
+Scope = DashboardStat.Scope
+
+_state = threading.local()
+
+
+def snapshot(customer_ids):
+    """Return ``{customer_id: frozenset(city_ids)}``, or None for a missing customer"""
+    customer_ids = set(customer_ids)
+    if not customer_ids:
+        return {}
+    existing = set(
+        Customer.objects.filter(id__in=customer_ids).values_list("id", flat=True)
+    )
+    cities = defaultdict(set)
+    for customer_id, city_id in Address.objects.filter(
+        customer_id__in=existing
+    ).values_list("customer_id", "city_id"):
+        cities[customer_id].add(city_id)
+    return {
+        customer_id: frozenset(cities[customer_id]) if customer_id in existing else None
+        for customer_id in customer_ids
+    }
+
+
+def _keys(city_ids, geography=None):
+    """The stat rows a customer with addresses in ``city_ids`` counts towards"""
+    if city_ids is None:
+        return set()
+    if not city_ids:
+        return {(Scope.TOTAL, 0), (Scope.UNASSIGNED, 0)}
+
+    geography = geography or get_geography()
+    keys = {(Scope.TOTAL, 0)}
+    for city_id in city_ids:
+        city = geography.cities.get(city_id)
+        keys.add((Scope.CITY, city_id))
+        if city:
+            keys.add((Scope.STATE, city["state"]["id"]))
+            keys.add((Scope.COUNTRY, city["state"]["country"]["id"]))
+    return keys
+
+
+def apply_deltas(deltas):
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        # Without the total row the table was never filled, and a partial
+        # total would pass for a complete one: leave it to rebuild()
+        DashboardStat.objects.bulk_create(
+            [
+                DashboardStat(scope=scope, key_id=key_id)
+                for scope, key_id in deltas
+                if scope != Scope.TOTAL
+            ],
+            ignore_conflicts=True,
+        )
+        for (scope, key_id), delta in deltas.items():
+            DashboardStat.objects.filter(scope=scope, key_id=key_id).update(
+                count=F("count") + delta
+            )
+
+
+def apply_changes(before):
+    """Update the stats for customers whose state was ``before`` a change.
+
+    ``before`` comes from snapshot(); the customers are looked up again and
+    only the rows they joined or left are incremented or decremented.
+    """
+    after = snapshot(before.keys())
+    deltas = Counter()
+    for customer_id, cities in before.items():
+        old, new = _keys(cities), _keys(after[customer_id])
+        for key in new - old:
+            deltas[key] += 1
+        for key in old - new:
+            deltas[key] -= 1
+    apply_deltas(deltas)
+    return after
+
+
+class track_customers:
+    """Apply stat changes for writes that skip signals, e.g. bulk operations.
+
+    Signal-driven tracking is suspended inside the block so that any
+    per-object signals sent meanwhile aren't counted twice.
+    """
+
+    def __init__(self, customer_ids):
+        self.customer_ids = customer_ids
+
+    def __enter__(self):
+        self.before = snapshot(self.customer_ids)
+        self.suspended = getattr(_state, "suspended", False)
+        _state.suspended = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _state.suspended = self.suspended
+        if exc_type is None:
+            apply_changes(self.before)
+
+
+def customers_created(customer_ids):
+    """Count new customers, with whatever addresses they already have"""
+    apply_changes({customer_id: None for customer_id in customer_ids})
+
+
+def inserted_deltas(city_sets, deltas=None):
+    """Add new customers, given the cities of each one's addresses, to ``deltas``.
+
+    For bulk inserts that know every address, so nothing is read back; pass
+    the result to apply_deltas().
+    """
+    deltas = Counter() if deltas is None else deltas
+    geography = get_geography()
+    # A customer counts towards the union of its cities' keys; they are
+    # collected for the whole batch and counted at once
+    city_keys = {}
+    counted = []
+    for city_ids in city_sets:
+        keys = set()
+        for city_id in city_ids:
+            if city_id not in city_keys:
+                city_keys[city_id] = _keys({city_id}, geography)
+            keys |= city_keys[city_id]
+        counted.extend(keys or _keys(frozenset()))
+    deltas.update(counted)
+    return deltas
+
+
+# Signal handlers snapshot a customer before a write and diff it afterwards.
+# Deleting several addresses of a customer at once sends every pre_delete
+# before any post_delete, so the first post_delete consumes the snapshot and
+# applies the whole change; the later ones find no snapshot and do nothing.
+
+
+def capture(customer_id):
+    if getattr(_state, "suspended", False):
+        return
+    if not hasattr(_state, "snapshots"):
+        _state.snapshots = {}
+    _state.snapshots.update(snapshot([customer_id]))
+
+
+def changed(customer_id, default=None):
+    """Apply the change since capture(), or since ``default`` if not captured"""
+    if getattr(_state, "suspended", False):
+        return
+    before = getattr(_state, "snapshots", {}).pop(customer_id, default)
+    if before is not None:
+        apply_changes({customer_id: before})
+
+
+def rebuild():
+    """Recompute every stat row from the customer and address tables"""
+    rows = [
+        DashboardStat(scope=Scope.TOTAL, count=Customer.objects.count()),
+        DashboardStat(
+            scope=Scope.UNASSIGNED,
+            count=Customer.objects.filter(addresses__isnull=True).count(),
+        ),
+    ]
+    for scope, field in [
+        (Scope.CITY, "city_id"),
+        (Scope.STATE, "city__state_id"),
+        (Scope.COUNTRY, "city__state__country_id"),
+    ]:
+        counts = Address.objects.values(key_id=F(field)).annotate(
+            count=Count("customer_id", distinct=True)
+        )
+        rows += [DashboardStat(scope=scope, **values) for values in counts]
+
+    with transaction.atomic():
+        DashboardStat.objects.all().delete()
+        DashboardStat.objects.bulk_create(rows, batch_size=1000)
+    return rows
+
+
+DASHBOARD_SCOPES = [Scope.TOTAL, Scope.UNASSIGNED, Scope.COUNTRY]
+
+
+def _dashboard(stats, countries):
+    by_country = [
+        {"country": countries[key_id]["name"], "count": count}
+        for (scope, key_id), count in stats.items()
+        if scope == Scope.COUNTRY and count > 0 and key_id in countries
+    ]
+    if stats.get((Scope.UNASSIGNED, 0)):
+        by_country.append({"country": None, "count": stats[(Scope.UNASSIGNED, 0)]})
+
+    return {
+        "totalCustomers": stats[(Scope.TOTAL, 0)],
+        "customersByCountry": by_country,
+    }
+
+
+def dashboard():
+    """Return the total and per-country customer counts for the dashboard"""
+    stats = {
+        (stat.scope, stat.key_id): stat.count
+        for stat in DashboardStat.objects.filter(scope__in=DASHBOARD_SCOPES)
+    }
+    if (Scope.TOTAL, 0) not in stats:
+        rebuild()
+        return dashboard()
+    return _dashboard(stats, get_geography().countries)
+
+
+async def adashboard():
+    """Async dashboard(), falling back to the sync version to rebuild the rows"""
+    stats = {
+        (stat.scope, stat.key_id): stat.count
+        async for stat in DashboardStat.objects.filter(scope__in=DASHBOARD_SCOPES)
+    }
+    if (Scope.TOTAL, 0) not in stats:
+        return await sync_to_async(dashboard)()
+    return _dashboard(stats, (await aget_geography()).countries)
@@ -0,0 +1,275 @@
+import random
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import UTC, datetime, timedelta
+from itertools import islice, product
+from string import ascii_uppercase
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import stats
+from .geography import invalidate_geography
+from .models import Country, State, City, Customer, Address
+from .search import bulk_indexing
+
+BATCH_SIZE = 20000
+
+# Synthetic country codes are "Z" plus two letters
+COUNTRY_CODES = ["Z" + "".join(pair) for pair in product(ascii_uppercase, repeat=2)]
+MAX_COUNTRIES = len(COUNTRY_CODES)
+
+# fmt: off
+FIRST_NAMES = [
+    "Ana", "Carlos", "Maria", "Jose", "Laura", "Pedro", "Sofia", "Luis",
+    "Elena", "Miguel", "Isabel", "Juan", "Carmen", "Diego", "Lucia", "Rafael",
+]
+LAST_NAMES = [
+    "Garcia", "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez",
+    "Perez", "Sanchez", "Ramirez", "Torres", "Flores", "Rivera", "Gomez",
+]
+# fmt: on
+STREETS = ["Main St", "Duarte Ave", "Oak St", "Maple Ave", "Church St", "Park Ave"]
+
+# Customer n signs up at a random moment of the n-th interval from this date
+CREATED_FROM = datetime(2020, 1, 1, tzinfo=UTC)
+SIGNUP_INTERVAL = timedelta(minutes=1)
+
+
+class SyntheticData:
+    """Deterministic fake geography and customers, written in large batches.
+
+    The same ``seed`` and sizes always produce the same rows, and rows that
+    already exist (matched by name or email) are left alone, so running the
+    generator again only fills in what is missing.
+    """
+
+    def __init__(self, seed=0, batch_size=BATCH_SIZE):
+        self.seed = seed
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+
+    def geography(self, countries, states_per_country, cities_per_state):
+        """Create the geography and return the ids of its cities"""
+        if countries > MAX_COUNTRIES:
+            raise ValueError(f"At most {MAX_COUNTRIES} synthetic countries")
+
+        codes = COUNTRY_CODES[:countries]
+        with transaction.atomic():
+            Country.objects.bulk_create(
+                [Country(name=f"Country {code}", code=code) for code in codes],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+            country_ids = list(
+                Country.objects.filter(code__in=codes)
+                .order_by("code")
+                .values_list("id", flat=True)
+            )
+            states = self._children(
+                State,
+                "country_id",
+                country_ids,
+                states_per_country,
+                lambda parent, i: f"State {parent}-{i}",
+            )
+            cities = self._children(
+                City,
+                "state_id",
+                states,
+                cities_per_state,
+                lambda parent, i: f"City {parent}-{i}",
+            )
+
+        invalidate_geography()
+        return cities
+
+    def _children(self, model, parent_field, parent_ids, per_parent, name):
+        """Create the missing ``per_parent`` rows under each parent, return all ids.
+
+        The parents are synthetic, so every child they have is too.
+        """
+        wanted = {
+            (parent_id, name(parent_id, i))
+            for parent_id in parent_ids
+            for i in range(per_parent)
+        }
+        existing = set(
+            model.objects.filter(**{f"{parent_field}__in": parent_ids}).values_list(
+                parent_field, "name"
+            )
+        )
+        model.objects.bulk_create(
+            [
+                model(**{parent_field: parent_id, "name": child_name})
+                for parent_id, child_name in sorted(wanted - existing)
+            ],
+            batch_size=self.batch_size,
+        )
+        return list(
+            model.objects.filter(**{f"{parent_field}__in": parent_ids})
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def email(self, n):
+        return f"customer{n}.{self.seed}@example.com"
+
+    def customer_rows(
+        self, count, addresses_per_customer, city_ids, created_from=CREATED_FROM
+    ):
+        """Yield ``(email, name, phone, addresses, created_at)`` tuples.
+
+        ``addresses`` is a list of ``(street, city_id, zip_code)``, and
+        ``created_at`` counts from ``created_from``.
+        """
+        # Every value is drawn from one random() call: randint() and choice()
+        # cost several times more and dominate the generation time
+        rand = self.random.random
+        for n in range(count):
+            yield (
+                self.email(n),
+                f"{_pick(FIRST_NAMES, rand())} {_pick(LAST_NAMES, rand())}",
+                f"809-{200 + int(rand() * 800)}-{int(rand() * 10000):04d}",
+                [
+                    (
+                        f"{1 + int(rand() * 9999)} {_pick(STREETS, rand())}",
+                        _pick(city_ids, rand()),
+                        f"{10000 + int(rand() * 90000)}",
+                    )
+                    for _ in range(addresses_per_customer)
+                ],
+                created_from + (n + rand()) * SIGNUP_INTERVAL,
+            )
+
+    def customers(self, count, addresses_per_customer, city_ids, on_batch=None):
+        """Create ``count`` customers with their addresses, return how many were new.
+
+        Rows go in as plain tuples through ``executemany``, which the MySQL
+        driver turns into multi-row INSERTs, with customer ids assigned
+        here so addresses never wait for them to be read back. No model
+        instances are built and no signals are sent. Each batch is one
+        transaction (when loading most of the table on SQLite, a savepoint:
+        see ``_deferred_indexes()``); the dashboard stats are updated once at
+        the end, from the generated rows.
+
+        Batches are written in order, so when the first customer of the seed
+        is missing none of them exist and batches skip the lookup of existing
+        emails. Ids continue from the highest one, which is locked (on
+        backends with SELECT ... FOR UPDATE) while a batch is written: run
+        one generator at a time, and not alongside other customer writes.
+        """
+        connection = connections[Customer.objects.db]
+        customer_sql = _insert_sql(
+            connection, Customer, ["id", "name", "email", "phone", "created_at"]
+        )
+        address_sql = _insert_sql(
+            connection,
+            Address,
+            ["customer_id", "street", "city_id", "zip_code", "created_at"],
+        )
+        # Naive datetimes in the database's time zone are written as they are
+        if settings.USE_TZ:
+            created_from = timezone.make_naive(CREATED_FROM, connection.timezone)
+        else:
+            created_from = timezone.make_naive(CREATED_FROM)
+        rows = self.customer_rows(count, addresses_per_customer, city_ids, created_from)
+        fresh = not Customer.objects.filter(email=self.email(0)).exists()
+        deltas = Counter()
+        created = 0
+        done = 0
+
+        # Rebuilding the indexes only pays off when most rows will be new
+        if fresh and count >= Customer.objects.count():
+            loading = _deferred_indexes(connection, Address)
+        else:
+            loading = nullcontext()
+
+        with loading:
+            while batch := list(islice(rows, self.batch_size)):
+                done += len(batch)
+                if not fresh:
+                    existing = set(
+                        Customer.objects.filter(
+                            email__in=[email for email, *_ in batch]
+                        ).values_list("email", flat=True)
+                    )
+                    batch = [row for row in batch if row[0] not in existing]
+
+                self._write_batch(connection, batch, customer_sql, address_sql)
+                stats.inserted_deltas(
+                    ([city_id for _, city_id, _ in row[3]] for row in batch),
+                    deltas,
+                )
+                created += len(batch)
+                if on_batch:
+                    on_batch(done)
+
+        stats.apply_deltas(deltas)
+        return created
+
+    def _write_batch(self, connection, batch, customer_sql, address_sql):
+        """Insert a batch of customer rows, with ids after the highest one"""
+        with transaction.atomic(using=connection.alias):
+            last_id = (
+                Customer.objects.select_for_update()
+                .order_by("-id")
+                .values_list("id", flat=True)
+                .first()
+            )
+            next_id = (last_id or 0) + 1
+            customers = []
+            addresses = []
+            for customer_id, row in enumerate(batch, start=next_id):
+                email, name, phone, customer_addresses, created_at = row
+                created_at = connection.ops.adapt_datetimefield_value(created_at)
+                customers.append((customer_id, name, email, phone, created_at))
+                addresses += [
+                    (customer_id, street, city_id, zip_code, created_at)
+                    for street, city_id, zip_code in customer_addresses
+                ]
+            with bulk_indexing(connection, next_id), connection.cursor() as cursor:
+                cursor.executemany(customer_sql, customers)
+                cursor.executemany(address_sql, addresses)
+
+
+@contextmanager
+def _deferred_indexes(connection, model):
+    """On SQLite, drop ``model``'s indexes in the block and rebuild them after.
+
+    Building an index once over every row is several times faster than
+    updating it row by row. The block is one transaction, so if it fails
+    the dropped indexes come back with the rollback; SQLite's DDL is
+    transactional. Other databases are left as they are.
+    """
+    if connection.vendor != "sqlite":
+        yield
+        return
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # Indexes without SQL back PRIMARY KEY and UNIQUE constraints
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+            [model._meta.db_table],
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+        yield
+        for _, sql in indexes:
+            cursor.execute(sql)
+
+
+def _pick(values, fraction):
+    return values[int(fraction * len(values))]
+
+
+def _insert_sql(connection, model, fields):
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(model._meta.get_field(field).column) for field in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    return (
+        f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})"
+    )
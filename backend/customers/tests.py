@@ -1,3 +1,1344 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+import openpyxl
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import RefreshToken
+from .geography import get_geography
+from .instrumentation import RequestMetrics
+from . import stats
+from .blacklist import blacklist_token, get_blacklist, invalidate_blacklist
+from .models import (
+    Customer,
+    Country,
+    State,
+    City,
+    Address,
+    BackgroundJob,
+    DashboardStat,
+)
+from .reports.formatting import ColumnWidths
+from .reports.parallel import shard_bounds, write_report_parallel
+from .reports.rows import (
+    iter_report_rows,
+    report_columns,
+    report_queryset,
+    report_record_chunks,
+)
+from .reports.writers import write_csv, write_xlsx
+from .serializers import CitySerializer, CustomerSerializer, StateSerializer
+from .synthetic import SyntheticData
+from .views.customer import CustomerViewSet
+
+
+class CustomerAPITestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tester", password="secret")
+        country = Country.objects.create(name="Dominican Republic", code="DOM")
+        state = State.objects.create(name="Santiago", country=country)
+        cls.cities = [
+            City.objects.create(name=f"City {i}", state=state) for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        get_geography()
+
+    def create_customers(self, count, addresses_per_customer=2):
+        start = Customer.objects.count()
+        for i in range(start, start + count):
+            customer = Customer.objects.create(
+                name=f"Customer {i}", email=f"customer{i}@example.com"
+            )
+            for j in range(addresses_per_customer):
+                Address.objects.create(
+                    customer=customer,
+                    street=f"{j} Main St",
+                    city=self.cities[j % len(self.cities)],
+                )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+
+class CustomerListQueryTests(CustomerAPITestCase):
+    def test_list_query_count_is_fixed(self):
+        self.create_customers(200)
+
+        # COUNT(*), the page of customers and one prefetch for their addresses
+        for page_size in [5, 50, 200]:
+            with self.subTest(page_size=page_size):
+                with self.assertNumQueries(3):
+                    response = self.client.get(f"/api/customers/?page_size={page_size}")
+                self.assertEqual(len(response.data["results"]), page_size)
+
+    def test_list_without_count(self):
+        self.create_customers(7)
+
+        # The page (plus one row to detect a next page) and its addresses
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/customers/?page=2&page_size=3&count=false")
+
+        self.assertIsNone(response.data["count"])
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertIn("page=3", response.data["next"])
+        self.assertIn("count=false", response.data["next"])
+
+        response = self.client.get("/api/customers/?page=3&page_size=3&count=false")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(
+            self.client.get(
+                "/api/customers/?page=4&page_size=3&count=false"
+            ).status_code,
+            404,
+        )
+
+    def test_cursor_pagination_walks_every_customer(self):
+        self.create_customers(7)
+        # Ties on created_at, as bulk inserts produce, are ordered by id
+        Customer.objects.filter(id__gt=2).update(created_at=timezone.now())
+        expected = list(
+            Customer.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+        pages = []
+        url = "/api/customers/?pagination=cursor&page_size=3"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(len(queries), 2)
+            self.assertNotIn("OFFSET", queries[0]["sql"])
+            self.assertNotIn("count", response.data)
+            pages.append([customer["id"] for customer in response.data["results"]])
+            previous, url = response.data["previous"], response.data["next"]
+        self.assertEqual([pk for page in pages for pk in page], expected)
+
+        # And back again from the last page
+        pages.pop()
+        while previous:
+            response = self.client.get(previous)
+            page = [customer["id"] for customer in response.data["results"]]
+            self.assertEqual(page, pages.pop())
+            previous = response.data["previous"]
+        self.assertEqual(pages, [])
+
+    def test_list_matches_customer_serializer_bytes(self):
+        self.create_customers(3)
+        Customer.objects.create(name="Zoë \u2028 Núñez", email="zoe@example.com")
+        Customer.objects.filter(name="Customer 1").update(phone="809-555-0100")
+
+        response = self.client.get("/api/customers/?page_size=10")
+
+        customers = CustomerViewSet.queryset
+        data = CustomerSerializer(
+            customers, many=True, context={"request": response.wsgi_request}
+        ).data
+        expected = JSONRenderer().render(
+            {"count": 4, "next": None, "previous": None, "results": data}
+        )
+        self.assertEqual(response.content, expected)
+
+    def test_list_nests_city_state_and_country(self):
+        self.create_customers(1)
+
+        response = self.client.get("/api/customers/")
+        address = response.data["results"][0]["addresses"][0]
+
+        self.assertEqual(address["street"], "0 Main St")
+        self.assertEqual(address["city"]["name"], "City 0")
+        self.assertEqual(address["city"]["state"]["name"], "Santiago")
+        self.assertEqual(address["city"]["state"]["country"]["code"], "DOM")
+
+    def test_retrieve_query_count_is_fixed(self):
+        self.create_customers(1, addresses_per_customer=3)
+        customer = Customer.objects.get()
+
+        with self.assertNumQueries(2):
+            self.client.get(f"/api/customers/{customer.id}/")
+
+
+class CustomerLocationFilterTests(CustomerAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        country = Country.objects.create(name="United States", code="USA")
+        cls.texas = State.objects.create(name="Texas", country=country)
+        cls.austin = City.objects.create(name="Austin", state=cls.texas)
+
+    def test_filters_list_each_customer_once(self):
+        # Every customer has two addresses in the first country
+        self.create_customers(3)
+        abroad = Customer.objects.create(name="Abroad", email="abroad@example.com")
+        Address.objects.create(customer=abroad, street="1 Main St", city=self.austin)
+        local = self.cities[0].state
+
+        def ids(query):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(f"/api/customers/?page_size=50&{query}")
+            self.assertNotIn("customers_city", context.captured_queries[0]["sql"])
+            self.assertEqual(response.data["count"], len(response.data["results"]))
+            return sorted(customer["id"] for customer in response.data["results"])
+
+        local_ids = sorted(
+            Customer.objects.exclude(id=abroad.id).values_list("id", flat=True)
+        )
+        self.assertEqual(ids(f"country_id={local.country_id}"), local_ids)
+        self.assertEqual(ids(f"state_id={local.id}"), local_ids)
+        self.assertEqual(ids(f"state_id={self.texas.id}"), [abroad.id])
+        self.assertEqual(
+            ids(f"country_id__in={local.country_id},{self.texas.country_id}"),
+            sorted(local_ids + [abroad.id]),
+        )
+        self.assertEqual(ids("country_id=999"), [])
+        self.assertEqual(
+            self.client.get("/api/customers/?country_id=x").status_code, 400
+        )
+
+
+class CustomerUpdateTests(CustomerAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_customers(1, addresses_per_customer=3)
+        self.customer = Customer.objects.get()
+        self.url = f"/api/customers/{self.customer.id}/"
+        self.addresses = list(self.customer.addresses.order_by("id"))
+
+    def payload(self, addresses):
+        return {
+            "name": self.customer.name,
+            "email": self.customer.email,
+            "addresses": addresses,
+        }
+
+    def address_writes(self, addresses):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.put(self.url, self.payload(addresses), format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            query["sql"].split()[0]
+            for query in context.captured_queries
+            if query["sql"].split()[0] in ["INSERT", "UPDATE", "DELETE"]
+            and "customers_address" in query["sql"].split("WHERE")[0]
+        ]
+
+    def test_resubmitting_without_ids_writes_nothing(self):
+        addresses = [
+            {"street": address.street, "city": address.city_id, "zip_code": None}
+            for address in self.addresses
+        ]
+
+        self.assertEqual(self.address_writes(addresses), [])
+        self.assertEqual(list(self.customer.addresses.order_by("id")), self.addresses)
+
+    def test_only_changed_addresses_are_written(self):
+        first, second, _ = self.addresses
+        addresses = [
+            {"id": first.id, "street": first.street, "city": first.city_id},
+            {"id": second.id, "street": "Moved St", "city": second.city_id},
+            {"street": "New St", "city": self.cities[0].id},
+        ]
+
+        writes = self.address_writes(addresses)
+
+        self.assertEqual(writes, ["UPDATE"])
+        streets = self.customer.addresses.order_by("id").values_list("id", "street")
+        self.assertEqual(
+            list(streets),
+            [
+                (first.id, first.street),
+                (second.id, "Moved St"),
+                (self.addresses[2].id, "New St"),
+            ],
+        )
+
+    def test_removed_and_added_addresses(self):
+        first = self.addresses[0]
+        addresses = [
+            {"id": first.id, "street": first.street, "city": first.city_id},
+        ]
+
+        self.assertEqual(self.address_writes(addresses), ["DELETE"])
+        self.assertEqual(list(self.customer.addresses.all()), [first])
+
+        addresses.append({"street": "New St", "city": self.cities[0].id})
+        self.assertEqual(self.address_writes(addresses), ["INSERT"])
+
+    def test_blank_zip_code_is_kept(self):
+        addresses = [{"street": "New St", "city": self.cities[0].id, "zip_code": ""}]
+        self.address_writes(addresses)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["addresses"][0]["zip_code"], "")
+
+    def test_partial_update_keeps_addresses(self):
+        response = self.client.patch(self.url, {"phone": "555"}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.customer.addresses.count(), 3)
+
+    def test_unknown_address_id(self):
+        other = Customer.objects.create(name="Other", email="other@example.com")
+        foreign = Address.objects.create(
+            customer=other, street="x", city=self.cities[0]
+        )
+
+        response = self.client.put(
+            self.url,
+            self.payload(
+                [{"id": foreign.id, "street": "x", "city": self.cities[0].id}]
+            ),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.customer.addresses.count(), 3)
+
+    def test_reposting_a_customer_creates_new_addresses(self):
+        payload = self.client.get(self.url).data
+        payload["email"] = "copy@example.com"
+        for address in payload["addresses"]:
+            address["city"] = address["city"]["id"]
+
+        response = self.client.post("/api/customers/", payload, format="json")
+
+        self.assertEqual(response.status_code, 201, response.data)
+        copy = Customer.objects.get(email="copy@example.com")
+        self.assertEqual(copy.addresses.count(), 3)
+        self.assertEqual(self.customer.addresses.count(), 3)
+
+
+class CustomerSearchTests(CustomerAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name, email in [
+            ("Maria Gomez", "maria@example.com"),
+            ("Mario Perez", "mperez@example.com"),
+            ("Ana Gomez", "ana.gomez@mail.com"),
+            ("José Núñez", "jose@example.com"),
+        ]:
+            Customer.objects.create(name=name, email=email)
+
+    def search(self, term):
+        response = self.client.get("/api/customers/", {"search": term})
+        return [customer["name"] for customer in response.data["results"]]
+
+    def test_prefix_search_on_name_and_email(self):
+        self.assertEqual(sorted(self.search("mari")), ["Maria Gomez", "Mario Perez"])
+        self.assertEqual(self.search("gomez mar"), ["Maria Gomez"])
+        self.assertEqual(self.search("mperez"), ["Mario Perez"])
+        self.assertEqual(self.search("mail.com"), ["Ana Gomez"])
+        self.assertEqual(self.search("nunez"), ["José Núñez"])
+
+    def test_best_match_first(self):
+        Customer.objects.create(name="Gomez Gomez", email="gg@example.com")
+
+        self.assertEqual(self.search("gomez")[0], "Gomez Gomez")
+
+    def test_one_typo_per_word(self):
+        for term in ["perex", "pwrez", "mraio prez", "maario"]:
+            self.assertEqual(self.search(term), ["Mario Perez"], term)
+        self.assertEqual(self.search("mraio pwrx"), [])
+
+    def test_report_applies_search(self):
+        response = self.client.get(
+            "/api/customers/generate_report/", {"search": "gomez", "file_type": "csv"}
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(len(lines), 3)
+
+    def test_broad_search_is_not_truncated(self):
+        Customer.objects.bulk_create(
+            Customer(name=f"Gomez {i}", email=f"gomez{i}@example.com")
+            for i in range(1200)
+        )
+
+        response = self.client.get(
+            "/api/customers/", {"search": "gomez", "page": 25, "page_size": 50}
+        )
+        self.assertEqual(response.data["count"], 1202)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_index_follows_updates_and_deletes(self):
+        maria = Customer.objects.get(email="maria@example.com")
+        maria.name = "Maria Lopez"
+        maria.save()
+        Customer.objects.filter(email="jose@example.com").delete()
+
+        self.assertEqual(self.search("lopez"), ["Maria Lopez"])
+        self.assertEqual(self.search("gomez"), ["Ana Gomez"])
+        self.assertEqual(self.search("jose"), [])
+
+
+class GeographyCacheTests(CustomerAPITestCase):
+    def test_dropdowns_are_served_without_queries(self):
+        state = self.cities[0].state
+
+        with self.assertNumQueries(0):
+            countries = self.client.get("/api/countries/")
+            states = self.client.get(
+                f"/api/states/by_country/?country_id={state.country_id}"
+            )
+            cities = self.client.get(f"/api/cities/by_state/?state_id={state.id}")
+            city = self.client.get(f"/api/cities/{self.cities[0].id}/")
+
+        self.assertEqual(countries.data["count"], 1)
+        self.assertEqual(states.data, StateSerializer([state], many=True).data)
+        self.assertEqual(len(cities.data), 3)
+        self.assertEqual(city.data, CitySerializer(self.cities[0]).data)
+
+    def test_changes_invalidate_the_cache(self):
+        state = self.cities[0].state
+        City.objects.create(name="New City", state=state)
+        self.cities[1].delete()
+
+        response = self.client.get(f"/api/cities/by_state/?state_id={state.id}")
+
+        names = [city["name"] for city in response.data]
+        self.assertEqual(names, ["City 0", "City 2", "New City"])
+
+    def test_unknown_ids(self):
+        response = self.client.get("/api/states/by_country/?country_id=abc")
+        self.assertEqual(response.data, [])
+        response = self.client.get("/api/countries/999/")
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(CustomerAPITestCase):
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_geography_etags(self):
+        state = self.cities[0].state
+        for url in [
+            "/api/countries/",
+            f"/api/countries/{state.country_id}/",
+            f"/api/states/by_country/?country_id={state.country_id}",
+            f"/api/cities/by_state/?state_id={state.id}",
+        ]:
+            with self.subTest(url=url):
+                etag = self.client.get(url)["ETag"]
+                self.assertNotModified(url, etag)
+
+                City.objects.create(name="New City", state=state)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+
+    def test_customer_etag_changes_with_its_addresses(self):
+        self.create_customers(2)
+        customer, other = Customer.objects.order_by("id")
+        url = f"/api/customers/{customer.id}/"
+
+        etag = self.client.get(url)["ETag"]
+        self.assertNotModified(url, etag)
+        other.addresses.first().delete()
+        self.assertNotModified(url, etag)
+
+        customer.addresses.first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["addresses"]), 1)
+
+        etag = response["ETag"]
+        self.client.post(
+            "/api/customers/bulk_upsert/",
+            [{"name": "Renamed", "email": customer.email}],
+            format="json",
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)["ETag"]
+        self.client.post(
+            "/api/customers/bulk_delete/",
+            {"customer_ids": [customer.id]},
+            format="json",
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_customer_etag_changes_with_its_geography(self):
+        self.create_customers(1)
+        customer = Customer.objects.get()
+        url = f"/api/customers/{customer.id}/"
+
+        etag = self.client.get(url)["ETag"]
+        self.assertNotModified(url, etag)
+        city = customer.addresses.first().city
+        city.name = "Renamed City"
+        city.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["addresses"][0]["city"]["name"], "Renamed City")
+
+    def test_customer_etag_expires(self):
+        self.create_customers(1)
+        url = f"/api/customers/{Customer.objects.get().id}/"
+        etag = self.client.get(url)["ETag"]
+
+        # Another process may have changed the customer meanwhile
+        later = time.time() + caches["customer_versions"].default_timeout + 1
+        with patch("time.time", return_value=later):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class SyntheticDataTests(CustomerAPITestCase):
+    def test_generates_deterministic_rows_once(self):
+        data = SyntheticData(seed=7)
+        city_ids = data.geography(2, 2, 3)
+        self.assertEqual(len(city_ids), 12)
+        self.assertEqual(data.customers(5, 2, city_ids), 5)
+
+        rows = list(
+            Customer.objects.filter(email__endswith=".7@example.com")
+            .order_by("email")
+            .values_list("name", "phone", "created_at", "addresses__city_id")
+        )
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(len({row[2] for row in rows}), 5)
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(
+                cursor, Address._meta.db_table
+            )
+        self.assertIn("address_customer_city_idx", indexes)
+        self.assertEqual(stats.dashboard()["totalCustomers"], 5)
+
+        again = SyntheticData(seed=7)
+        self.assertEqual(again.geography(2, 2, 3), city_ids)
+        self.assertEqual(again.customers(6, 2, city_ids), 1)
+        self.assertEqual(
+            list(
+                Customer.objects.filter(email__endswith=".7@example.com")
+                .exclude(email="customer5.7@example.com")
+                .order_by("email")
+                .values_list("name", "phone", "created_at", "addresses__city_id")
+            ),
+            rows,
+        )
+
+    def test_seed_data_command(self):
+        call_command(
+            "seed_data",
+            countries=1,
+            states_per_country=1,
+            cities_per_state=2,
+            customers=30,
+            seed=3,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(
+            Customer.objects.filter(email__endswith=".3@example.com").count(), 30
+        )
+        self.assertTrue(Country.objects.filter(code="USA").exists())
+
+        # Counted in the stats and found through the search index
+        self.assertEqual(stats.dashboard()["totalCustomers"], 30)
+        name = Customer.objects.get(email="customer0.3@example.com").name
+        response = self.client.get("/api/customers/", {"search": name})
+        self.assertIn(
+            "customer0.3@example.com",
+            [customer["email"] for customer in response.data["results"]],
+        )
+
+
+class PerformanceMiddlewareTests(CustomerAPITestCase):
+    @override_settings(PERFORMANCE_INSTRUMENTATION=False)
+    def test_off_unless_enabled(self):
+        response = self.client.get("/api/customers/")
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(PERFORMANCE_INSTRUMENTATION=True)
+    def test_reports_sampled_requests(self):
+        self.create_customers(3)
+        with self.assertLogs("customers.instrumentation", "INFO") as logs:
+            response = self.client.get("/api/customers/")
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], "/api/customers/")
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["queries"], 0)
+        self.assertIn("serialize_ms", record)
+        self.assertIn("render_ms", record)
+        self.assertEqual(record["response_bytes"], len(response.content))
+        self.assertIn(f'desc="{record["queries"]} queries"', response["Server-Timing"])
+
+    @override_settings(PERFORMANCE_INSTRUMENTATION=True)
+    def test_times_model_serializers(self):
+        self.create_customers(1)
+        customer = Customer.objects.get()
+        with self.assertLogs("customers.instrumentation", "INFO") as logs:
+            self.client.get(f"/api/customers/{customer.id}/")
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertIn("serialize_ms", record)
+
+    @override_settings(PERFORMANCE_INSTRUMENTATION=True)
+    async def test_reports_async_requests(self):
+        await sync_to_async(self.create_customers)(3)
+        token = await sync_to_async(RefreshToken.for_user)(self.user)
+        with self.assertLogs("customers.instrumentation", "INFO") as logs:
+            response = await self.async_client.get(
+                "/api/async/customers/",
+                headers={"Authorization": f"Bearer {token.access_token}"},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], "/api/async/customers/")
+        self.assertGreater(record["queries"], 0)
+        self.assertIn("Server-Timing", response)
+
+    @override_settings(PERFORMANCE_INSTRUMENTATION=True, PERFORMANCE_SAMPLE_RATE=0)
+    def test_skips_unsampled_requests(self):
+        response = self.client.get("/api/customers/")
+        self.assertNotIn("Server-Timing", response)
+
+    def test_detects_duplicate_and_repeated_queries(self):
+        metrics = RequestMetrics()
+        with connection.execute_wrapper(metrics):
+            for customer_id in [1, 1, 2]:
+                Customer.objects.filter(id=customer_id).exists()
+
+        self.assertEqual(metrics.queries, 3)
+        self.assertEqual(metrics.duplicate_queries, 1)
+        [(count, sql)] = metrics.repeated_statements(3)
+        self.assertEqual(count, 3)
+        self.assertIn("customers_customer", sql)
+
+
+class DashboardStatsTests(CustomerAPITestCase):
+    url = "/api/dashboard/"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        country = Country.objects.create(name="United States", code="USA")
+        state = State.objects.create(name="Texas", country=country)
+        cls.abroad = City.objects.create(name="Austin", state=state)
+
+    def assertStatsMatchRebuild(self):
+        def counts():
+            return {
+                (stat.scope, stat.key_id): stat.count
+                for stat in DashboardStat.objects.exclude(count=0)
+            }
+
+        maintained = counts()
+        stats.rebuild()
+        self.assertEqual(maintained, counts())
+
+    def test_dashboard_reads_stats(self):
+        self.create_customers(3)
+        Customer.objects.create(name="Nowhere", email="nowhere@example.com")
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data["totalCustomers"], 4)
+        self.assertCountEqual(
+            response.data["customersByCountry"],
+            [
+                {"country": "Dominican Republic", "count": 3},
+                {"country": None, "count": 1},
+            ],
+        )
+        self.assertStatsMatchRebuild()
+
+    def test_writes_before_the_stats_exist_are_not_counted_alone(self):
+        self.create_customers(3)
+        DashboardStat.objects.all().delete()
+        Customer.objects.create(name="Nowhere", email="nowhere@example.com")
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["totalCustomers"], 4)
+        self.assertStatsMatchRebuild()
+
+    def test_stats_follow_address_changes(self):
+        self.create_customers(3)
+        customer = Customer.objects.order_by("id").first()
+        address = customer.addresses.first()
+        address.city = self.abroad
+        address.save()
+        self.assertStatsMatchRebuild()
+
+        customer.addresses.all().delete()
+        self.assertStatsMatchRebuild()
+
+        Customer.objects.last().delete()
+        self.assertStatsMatchRebuild()
+        self.assertEqual(self.client.get(self.url).data["totalCustomers"], 2)
+
+    def test_stats_follow_api_writes(self):
+        city_id = self.cities[0].id
+        response = self.client.post(
+            "/api/customers/",
+            {
+                "name": "Ann",
+                "email": "ann@example.com",
+                "addresses": [{"street": "1 Main St", "city": city_id}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertStatsMatchRebuild()
+
+        response = self.client.put(
+            f"/api/customers/{response.data['id']}/",
+            {
+                "name": "Ann",
+                "email": "ann@example.com",
+                "addresses": [{"street": "1 Main St", "city": self.abroad.id}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertStatsMatchRebuild()
+
+        content = (
+            "name,email,phone,street,city_id,zip_code\n"
+            f"Bob,bob@example.com,,1 Main St,{city_id},\n"
+            "Eve,eve@example.com,,,,\n"
+        )
+        upload = SimpleUploadedFile("customers.csv", content.encode())
+        self.client.post("/api/customers/bulk_import/", {"file": upload})
+        self.assertStatsMatchRebuild()
+        self.assertEqual(self.client.get(self.url).data["totalCustomers"], 3)
+
+
+class AsyncReadTests(CustomerAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_customers_match_the_sync_endpoints(self):
+        self.create_customers(7)
+        customer = Customer.objects.first()
+
+        for query in ["", "?page=2", "?page_size=3&count=false", "?search=customer1"]:
+            sync = self.client.get(f"/api/customers/{query}")
+            response = self.client.get(f"/api/async/customers/{query}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                json.loads(response.content.decode().replace("/async/", "/")),
+                sync.json(),
+            )
+
+        response = self.client.get(f"/api/async/customers/{customer.id}/")
+        self.assertEqual(
+            response.json(), self.client.get(f"/api/customers/{customer.id}/").json()
+        )
+        self.assertEqual(self.client.get("/api/async/customers/0/").status_code, 404)
+        self.assertEqual(
+            self.client.get("/api/async/customers/?page=9").status_code, 404
+        )
+
+    def test_invalid_filters_match_the_sync_endpoint(self):
+        sync = self.client.get("/api/customers/?country_id=abc")
+        response = self.client.get("/api/async/customers/?country_id=abc")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), sync.json())
+
+    def test_geography_and_dashboard(self):
+        state = self.cities[0].state
+        response = self.client.get(f"/api/async/cities/by_state/?state_id={state.id}")
+        self.assertEqual(response.json(), CitySerializer(self.cities, many=True).data)
+        response = self.client.get(
+            f"/api/async/states/by_country/?country_id={state.country_id}"
+        )
+        self.assertEqual(response.json(), StateSerializer([state], many=True).data)
+        self.assertEqual(
+            self.client.get("/api/async/states/by_country/").status_code, 400
+        )
+
+        self.create_customers(2)
+        response = self.client.get("/api/async/dashboard/")
+        self.assertEqual(response.json(), self.client.get("/api/dashboard/").json())
+
+    def test_requires_a_valid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer nonsense")
+        self.assertEqual(self.client.get("/api/async/customers/").status_code, 401)
+        self.client.credentials()
+        response = self.client.get("/api/async/dashboard/")
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
+
+
+@override_settings(JWT_STATELESS_AUTH=True)
+class StatelessAuthTests(CustomerAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}"
+        )
+        get_blacklist()
+
+    def test_authentication_costs_no_queries(self):
+        self.create_customers(2)
+        for url in ["/api/customers/", "/api/dashboard/"]:
+            stateless = self.count_queries(url)
+            with override_settings(JWT_STATELESS_AUTH=False):
+                self.assertEqual(self.count_queries(url), stateless + 1)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/async/states/by_country/?country_id=1")
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_revokes_the_access_token(self):
+        response = self.client.post(
+            "/api/auth/logout/", {"refresh": str(self.refresh)}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/api/customers/").status_code, 401)
+        self.assertEqual(self.client.get("/api/async/customers/").status_code, 401)
+
+
+class TokenBlacklistTests(CustomerAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.refresh = RefreshToken.for_user(self.user)
+        get_blacklist()
+
+    def refresh_token(self, token):
+        return self.client.post("/api/auth/refresh/", {"refresh": str(token)})
+
+    def test_refresh_checks_blacklist_in_memory(self):
+        # Only the user lookup of TokenRefreshSerializer remains
+        with self.assertNumQueries(1):
+            response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(
+            "/api/auth/logout/", {"refresh": str(self.refresh)}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+        self.assertEqual(
+            self.client.post(
+                "/api/token/refresh/", {"refresh": str(self.refresh)}
+            ).status_code,
+            401,
+        )
+
+    @override_settings(JWT_BLACKLIST_REFRESH_INTERVAL=1)
+    def test_logout_in_another_process_is_seen_within_the_interval(self):
+        invalidate_blacklist()
+        get_blacklist()
+        # Another process blacklists the token; its invalidation of a
+        # per-process cache never reaches this one
+        with patch("customers.blacklist.invalidate_blacklist"):
+            blacklist_token(self.refresh)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 200)
+
+        time.sleep(1.1)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    def test_prune_tokens(self):
+        expired = RefreshToken.for_user(self.user)
+        OutstandingToken.objects.filter(jti=expired["jti"]).update(
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+        blacklist_token(expired)
+        blacklist_token(self.refresh)
+
+        call_command("prune_tokens", batch_size=1, stdout=io.StringIO())
+
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)),
+            [self.refresh["jti"]],
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+class BulkDeleteTests(CustomerAPITestCase):
+    url = "/api/customers/bulk_delete/"
+
+    def test_deletes_in_chunks(self):
+        self.create_customers(5)
+        ids = list(Customer.objects.values_list("id", flat=True))
+
+        with patch("customers.deletion.CHUNK_SIZE", 2):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(
+                    self.url, {"customer_ids": ids[:3] + [0]}, format="json"
+                )
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(sorted(Customer.objects.values_list("id", flat=True)), ids[3:])
+        self.assertEqual(Address.objects.count(), 4)
+        deletes = [
+            q["sql"] for q in context.captured_queries if q["sql"].startswith("DELETE")
+        ]
+        self.assertEqual(len(deletes), 4)
+        self.assertEqual(self.client.get("/api/dashboard/").data["totalCustomers"], 2)
+
+        response = self.client.post(self.url, {"customer_ids": [0]}, format="json")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(self.url, {"customer_ids": ["x"]}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(JOBS_EAGER=True, BULK_DELETE_ASYNC_THRESHOLD=2)
+    def test_large_sets_run_as_a_job(self):
+        self.create_customers(3)
+        ids = list(Customer.objects.values_list("id", flat=True))
+
+        response = self.client.post(self.url, {"customer_ids": ids}, format="json")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["params"], {"customer_count": 3})
+        job = self.client.get(f"/api/jobs/{response.data['id']}/").data
+        self.assertEqual(job["status"], BackgroundJob.Status.COMPLETED)
+        self.assertEqual((job["progress"], job["total"]), (3, 3))
+        self.assertFalse(Customer.objects.exists())
+
+
+class LocationLabelTests(CustomerAPITestCase):
+    def test_labels_cost_no_queries(self):
+        self.create_customers(10)
+        city = self.cities[0]
+
+        with self.assertNumQueries(1):
+            labels = [str(address) for address in Address.objects.all()]
+        self.assertEqual(
+            labels[0], f"0 Main St, {city.name}, Santiago, Dominican Republic"
+        )
+
+        city.state.country.name = "República Dominicana"
+        city.state.country.save()
+        self.assertEqual(
+            str(City.objects.get(pk=city.pk)).split(", ")[-1], "República Dominicana"
+        )
+
+    def test_admin_changelists(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", password="secret")
+        )
+
+        def changelist_queries():
+            counts = {}
+            for model in ["address", "city", "state"]:
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(f"/admin/customers/{model}/")
+                self.assertEqual(response.status_code, 200)
+                counts[model] = len(context.captured_queries)
+            return counts
+
+        self.create_customers(5)
+        before = changelist_queries()
+        self.create_customers(20)
+        state = State.objects.create(
+            name="Puerto Plata", country=self.cities[0].state.country
+        )
+        for i in range(5):
+            City.objects.create(name=f"Town {i}", state=state)
+        get_geography()
+        self.assertEqual(changelist_queries(), before)
+
+
+class BulkImportTests(CustomerAPITestCase):
+    url = "/api/customers/bulk_import/"
+
+    def upload(self, content, name="customers.csv"):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(self.url, {"file": upload}, format="multipart")
+
+    def test_import_with_row_errors(self):
+        Customer.objects.create(name="Existing", email="existing@example.com")
+        city_id = self.cities[0].id
+        content = (
+            "name,email,phone,street,city_id,zip_code\n"
+            f"Ann,ann@example.com,555,1 Main St,{city_id},10101\n"
+            f"Ann,ann@example.com,555,2 Main St,{city_id},\n"
+            "Bob,bob@example.com,,,,\n"
+            f"Bad,not-an-email,,3 Main St,{city_id},\n"
+            "Lost,lost@example.com,,4 Main St,999,\n"
+            f"Dup,existing@example.com,,5 Main St,{city_id},\n"
+        )
+
+        response = self.upload(content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["rows"], 6)
+        self.assertEqual(response.data["customers_created"], 2)
+        self.assertEqual(response.data["addresses_created"], 2)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [5, 6, 7])
+        self.assertIn("email", response.data["errors"][0]["errors"])
+        self.assertIn("city_id", response.data["errors"][1]["errors"])
+        ann = Customer.objects.get(email="ann@example.com")
+        self.assertEqual(ann.addresses.count(), 2)
+        self.assertFalse(
+            Customer.objects.get(email="bob@example.com").addresses.exists()
+        )
+
+    def test_emails_are_matched_ignoring_case(self):
+        Customer.objects.create(name="Bob", email="Bob@Example.com")
+        city_id = self.cities[0].id
+        long_email = "a" * 250 + "@example.com"
+        content = (
+            "name,email,street,city_id\n"
+            f"Ann,ann@example.com,1 Main St,{city_id}\n"
+            f"Ann,Ann@Example.com,2 Main St,{city_id}\n"
+            f"Long,{long_email},,\n"
+            f"Bob,bob@example.com,3 Main St,{city_id}\n"
+        )
+
+        response = self.upload(content)
+
+        self.assertEqual(response.data["customers_created"], 1)
+        self.assertEqual(response.data["addresses_created"], 2)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [4, 5])
+        self.assertIn("email", response.data["errors"][0]["errors"])
+        self.assertEqual(
+            response.data["errors"][1]["errors"],
+            {"email": ["customer with this email already exists."]},
+        )
+
+    def test_conflicting_chunk_is_reported_as_row_errors(self):
+        content = "name,email\nAnn,ann@example.com\nBob,bob@example.com\n"
+        with patch(
+            "customers.imports.CustomerImport.save_chunk",
+            side_effect=IntegrityError("Duplicate entry"),
+        ):
+            response = self.upload(content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["customers_created"], 0)
+        self.assertEqual(response.data["error_count"], 2)
+        self.assertFalse(Customer.objects.exists())
+
+    def test_rejects_bad_files(self):
+        self.assertEqual(self.upload("a,b\n", name="customers.txt").status_code, 400)
+        self.assertEqual(self.upload("name,phone\nAnn,1\n").status_code, 400)
+        self.assertEqual(self.client.post(self.url).status_code, 400)
+
+
+class BulkUpsertTests(CustomerAPITestCase):
+    url = "/api/customers/bulk_upsert/"
+
+    def item(self, i, **fields):
+        return {
+            "name": f"Customer {i}",
+            "email": f"customer{i}@example.com",
+            "addresses": [{"street": f"{i} Main St", "city": self.cities[0].id}],
+            **fields,
+        }
+
+    def test_creates_and_updates_by_email(self):
+        self.create_customers(2, addresses_per_customer=1)
+        existing = Customer.objects.get(email="customer0@example.com")
+        kept = Customer.objects.get(email="customer1@example.com")
+        kept_address = kept.addresses.get()
+        items = [
+            self.item(0, name="Renamed", addresses=[]),
+            {"name": "Kept", "email": "customer1@example.com"},
+            self.item(2, phone="555"),
+            self.item(3, email="not-an-email"),
+            self.item(4, addresses=[{"street": "x", "city": 999}]),
+            self.item(2),
+        ]
+
+        response = self.client.post(self.url, items, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["updated"], 2)
+        self.assertEqual(response.data["error_count"], 3)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(
+            statuses, ["updated", "updated", "created", "invalid", "invalid", "invalid"]
+        )
+        self.assertEqual(response.data["results"][0]["id"], existing.id)
+        existing.refresh_from_db()
+        self.assertEqual(existing.name, "Renamed")
+        self.assertFalse(existing.addresses.exists())
+        self.assertEqual(list(kept.addresses.all()), [kept_address])
+        created = Customer.objects.get(email="customer2@example.com")
+        self.assertEqual(created.phone, "555")
+        self.assertEqual(created.addresses.get().street, "2 Main St")
+        self.assertEqual(self.client.get("/api/dashboard/").data["totalCustomers"], 3)
+
+    def test_query_count_does_not_grow_with_items(self):
+        def upsert(numbers, **fields):
+            items = [self.item(i, **fields) for i in numbers]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url, items, format="json")
+            self.assertEqual(response.data["error_count"], 0)
+            return len(context.captured_queries)
+
+        self.assertEqual(upsert(range(10)), upsert(range(10, 50)))
+        self.assertEqual(
+            upsert(range(10), phone="1", addresses=[]),
+            upsert(range(10, 50), phone="1", addresses=[]),
+        )
+
+    def test_emails_are_matched_ignoring_case(self):
+        existing = Customer.objects.create(name="Bob", email="Bob@Example.com")
+        items = [
+            self.item(0),
+            self.item(1, email="CUSTOMER0@example.com"),
+            self.item(2, email="bob@example.com"),
+        ]
+
+        response = self.client.post(self.url, items, format="json")
+
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["created", "invalid", "updated"],
+        )
+        self.assertEqual(response.data["results"][2]["id"], existing.id)
+        self.assertEqual(Customer.objects.count(), 2)
+        existing.refresh_from_db()
+        self.assertEqual(existing.name, "Customer 2")
+
+    def test_rejects_bad_payloads(self):
+        self.assertEqual(self.client.post(self.url, {}, format="json").status_code, 400)
+        self.assertEqual(self.client.post(self.url, [], format="json").status_code, 400)
+
+
+class GenerateReportTests(CustomerAPITestCase):
+    url = "/api/customers/generate_report/"
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for params in [
+            "",
+            "?format=combined",
+            "?file_type=csv",
+            "?format=combined&file_type=csv",
+        ]:
+            with self.subTest(params=params):
+                Address.objects.all().delete()
+                Customer.objects.all().delete()
+                self.create_customers(2)
+                small = self.count_queries(self.url + params)
+                self.create_customers(20, addresses_per_customer=3)
+                large = self.count_queries(self.url + params)
+                self.assertEqual(small, large)
+
+    def test_csv_rows(self):
+        self.create_customers(1)
+        Customer.objects.create(name="No Address", email="none@example.com")
+
+        response = self.client.get(self.url + "?file_type=csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith(f"{Customer.objects.last().id},"))
+        self.assertIn("0 Main St,City 0,Santiago,Dominican Republic", lines[2])
+
+    def test_records_are_read_in_keyset_chunks(self):
+        self.create_customers(3, addresses_per_customer=3)
+        Customer.objects.create(name="No Address", email="none@example.com")
+        # Ties on created_at are split by id
+        Customer.objects.update(created_at=timezone.now())
+        customers = Customer.objects.all()
+
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(report_record_chunks(customers, size=2))
+        # Customers and their addresses per chunk, then an empty last page
+        self.assertEqual(len(queries), 5)
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 6])
+        self.assertEqual(
+            [record for chunk in chunks for record in chunk],
+            list(report_queryset(customers)),
+        )
+
+    def test_combined_rows(self):
+        self.create_customers(1)
+
+        response = self.client.get(self.url + "?format=combined&file_type=csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertIn("0 Main St | 1 Main St,City 0 | City 1", lines[1])
+
+
+class ColumnarReportTests(CustomerAPITestCase):
+    url = "/api/customers/generate_report/"
+
+    def test_parquet_rows_are_typed(self):
+        self.create_customers(2)
+        Customer.objects.create(name="No Address", email="none@example.com")
+
+        response = self.client.get(self.url + "?file_type=parquet")
+        self.assertEqual(response.status_code, 200)
+        table = pq.read_table(io.BytesIO(b"".join(response.streaming_content)))
+
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.schema.field("Customer ID").type, pa.int64())
+        self.assertTrue(pa.types.is_timestamp(table.schema.field("Created At").type))
+        self.assertTrue(pa.types.is_dictionary(table.schema.field("City").type))
+        rows = table.to_pylist()
+        self.assertEqual(rows[0]["Email"], "none@example.com")
+        self.assertIsNone(rows[0]["City"])
+        self.assertEqual(rows[1]["City"], "City 0")
+        self.assertEqual(rows[1]["Country"], "Dominican Republic")
+
+    @override_settings(JOBS_EAGER=True, REPORTS_ROOT=tempfile.mkdtemp())
+    def test_arrow_job(self):
+        self.create_customers(3)
+        with patch("customers.reports.columnar.CHUNK_SIZE", 2):
+            response = self.client.post(
+                "/api/customers/report_jobs/", {"file_type": "arrow"}, format="json"
+            )
+        job = BackgroundJob.objects.get(pk=response.data["id"])
+        self.assertEqual(job.progress, 6)
+
+        table = ipc.open_file(job.file_path).read_all()
+        self.assertEqual(table.num_rows, 6)
+        self.assertEqual(
+            sorted(set(table.column("City").to_pylist())), ["City 0", "City 1"]
+        )
+
+    def test_columnar_reports_are_one_row_per_address(self):
+        response = self.client.get(self.url + "?file_type=parquet&format=combined")
+        self.assertEqual(response.status_code, 400)
+
+
+class ParallelReportTests(CustomerAPITestCase):
+    def write(self, file_type, **options):
+        customers = Customer.objects.all()
+        columns = report_columns("separate_rows")
+        path = os.path.join(tempfile.mkdtemp(), f"report.{file_type}")
+        if options:
+            write_report_parallel(
+                path, customers, "separate_rows", file_type, columns, **options
+            )
+        elif file_type == "csv":
+            with open(path, "w", newline="", encoding="utf-8") as output:
+                write_csv(output, columns, iter_report_rows(customers, "separate_rows"))
+        else:
+            write_xlsx(path, columns, iter_report_rows(customers, "separate_rows"))
+        return path
+
+    def test_shards_merge_into_the_sequential_report(self):
+        self.create_customers(7)
+        Customer.objects.create(name="No Address", email="none@example.com")
+        # Ties on created_at are split by id
+        Customer.objects.filter(id__lte=4).update(created_at=timezone.now())
+
+        with open(self.write("csv")) as expected:
+            with open(self.write("csv", workers=1, shards=3)) as merged:
+                self.assertEqual(merged.read(), expected.read())
+
+        expected = openpyxl.load_workbook(self.write("xlsx")).active
+        merged = openpyxl.load_workbook(self.write("xlsx", workers=1, shards=3)).active
+        self.assertEqual(list(merged.values), list(expected.values))
+        for column, dimension in expected.column_dimensions.items():
+            self.assertEqual(merged.column_dimensions[column].width, dimension.width)
+
+    def test_column_widths(self):
+        widths = ColumnWidths(["ID", "Name", "Phone"])
+        widths.update([[7, "Ana", ""], [-12345, "Bartholomew", None]])
+        widths.update([])
+        self.assertEqual(widths.widths, [6, 11, 5])
+        widths.merge([1, 20, 2])
+        self.assertEqual(widths.widths, [6, 20, 5])
+
+    def test_shard_bounds(self):
+        self.create_customers(5, addresses_per_customer=0)
+        bounds = shard_bounds(Customer.objects.all(), 2)
+        ids = Customer.objects.order_by("-created_at", "-id").values_list(
+            "id", flat=True
+        )
+        self.assertEqual([pk for _, pk in bounds], [ids[0], ids[3]])
+        self.assertEqual(shard_bounds(Customer.objects.none(), 2), [])
+
+
+@override_settings(JOBS_EAGER=True, REPORTS_ROOT=tempfile.mkdtemp())
+class ReportJobTests(CustomerAPITestCase):
+    url = "/api/customers/report_jobs/"
+
+    def test_job_produces_downloadable_report(self):
+        self.create_customers(3)
+
+        response = self.client.post(self.url, {"file_type": "csv"}, format="json")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data["id"]
+
+        response = self.client.get(f"/api/jobs/{job_id}/")
+        self.assertEqual(response.data["status"], BackgroundJob.Status.COMPLETED)
+        self.assertEqual(response.data["progress"], 6)
+        self.assertEqual(response.data["total"], 6)
+
+        response = self.client.get(f"/api/jobs/{job_id}/download/")
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 7)
+
+    def test_same_params_reuse_cached_report(self):
+        self.create_customers(1)
+        params = {"country_id": 1, "format": "combined"}
+
+        first = self.client.post(self.url, params, format="json")
+        second = self.client.post(self.url, params, format="json")
+        other = self.client.post(self.url, {"format": "combined"}, format="json")
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.data["id"], second.data["id"])
+        self.assertNotEqual(first.data["id"], other.data["id"])
+        self.assertEqual(BackgroundJob.objects.count(), 2)
+
+    def test_abandoned_job_is_not_reused(self):
+        params = {"format": "combined"}
+        first = self.client.post(self.url, params, format="json")
+        # As if the process running it had stopped an hour ago
+        BackgroundJob.objects.filter(pk=first.data["id"]).update(
+            status=BackgroundJob.Status.RUNNING,
+            created_at=timezone.now() - timedelta(hours=2),
+        )
+
+        second = self.client.post(self.url, params, format="json")
+        self.assertEqual(second.status_code, 202)
+        self.assertNotEqual(first.data["id"], second.data["id"])
+        abandoned = BackgroundJob.objects.get(pk=first.data["id"])
+        self.assertEqual(abandoned.status, BackgroundJob.Status.FAILED)
+
+    def test_invalid_file_type(self):
+        response = self.client.post(self.url, {"file_type": "pdf"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_filters(self):
+        response = self.client.post(self.url, {"country_id": "abc"}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), self.client.get("/api/customers/?country_id=abc").json()
+        )
+        self.assertFalse(BackgroundJob.objects.exists())
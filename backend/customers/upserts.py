@@ -0,0 +1,161 @@
+from collections import defaultdict
+
+from django.db import connections, transaction
+
+from . import stats
+from .conditional import touch_customers
+from .address_sync import AddressChanges, UnknownAddress
+from .geography import get_geography
+from .models import Customer, Address
+from .serializers import BulkCustomerSerializer
+
+MAX_ITEMS = 5000
+BATCH_SIZE = 1000
+
+
+def _phone(data, customer):
+    """The submitted phone, or the current one when the item leaves it out"""
+    if "phone" in data:
+        return data["phone"] or None
+    return customer.phone if customer else None
+
+
+class CustomerUpsert:
+    """Create or update a batch of customers, matched by email, in one transaction.
+
+    Items with ``addresses`` get them synced like a PUT; items without keep
+    their current addresses. Invalid items are reported and skipped, the rest
+    are written with one upsert and one statement per kind of address change.
+    """
+
+    def __init__(self):
+        self.results = {}
+
+    def add_result(self, index, status, customer_id=None, errors=None):
+        result = {"index": index, "status": status, "id": customer_id}
+        if errors:
+            result["errors"] = errors
+        self.results[index] = result
+
+    def validate(self, items):
+        city_ids = get_geography().cities.keys()
+        valid = {}
+        for index, item in enumerate(items):
+            serializer = BulkCustomerSerializer(data=item)
+            if not serializer.is_valid():
+                self.add_result(index, "invalid", errors=serializer.errors)
+                continue
+
+            data = serializer.validated_data
+            unknown = [
+                address["city"]
+                for address in data.get("addresses", [])
+                if address["city"] not in city_ids
+            ]
+            # Emails differing only in case are one customer, see with_emails()
+            email = data["email"].lower()
+            if email in valid:
+                errors = {"email": ["Duplicate email in this batch."]}
+            elif unknown:
+                errors = {
+                    "addresses": [
+                        f'Invalid city pk "{city_id}" - object does not exist.'
+                        for city_id in unknown
+                    ]
+                }
+            else:
+                valid[email] = (index, data)
+                continue
+            self.add_result(index, "invalid", errors=errors)
+        return valid
+
+    def plan(self, valid):
+        existing = {
+            customer.email.lower(): customer
+            for customer in Customer.objects.with_emails(valid).only(
+                "id", "email", "phone"
+            )
+        }
+        addresses = defaultdict(list)
+        for address in Address.objects.filter(
+            customer_id__in=[customer.id for customer in existing.values()]
+        ):
+            addresses[address.customer_id].append(address)
+
+        planned = []
+        for email, (index, data) in valid.items():
+            customer = existing.get(email)
+            changes = AddressChanges()
+            if "addresses" in data:
+                try:
+                    changes.plan(
+                        customer.id if customer else None,
+                        addresses[customer.id] if customer else [],
+                        data["addresses"],
+                    )
+                except UnknownAddress as exc:
+                    self.add_result(index, "invalid", errors={"addresses": [str(exc)]})
+                    continue
+            planned.append((index, data, customer, changes))
+        return planned
+
+    def run(self, items):
+        valid = self.validate(items)
+        planned = self.plan(valid)
+
+        # Existing customers keep their email as stored, so that the upsert
+        # conflicts with them whatever the case of the submitted one
+        customers = [
+            Customer(
+                name=data["name"],
+                email=customer.email if customer else data["email"],
+                phone=_phone(data, customer),
+            )
+            for _, data, customer, _ in planned
+        ]
+        existing_ids = [customer.id for _, _, customer, _ in planned if customer]
+        features = connections[Customer.objects.db].features
+        conflict_target = {}
+        if features.supports_update_conflicts_with_target:
+            conflict_target["unique_fields"] = ["email"]
+
+        with transaction.atomic():
+            with stats.track_customers(existing_ids):
+                Customer.objects.bulk_create(
+                    customers,
+                    batch_size=BATCH_SIZE,
+                    update_conflicts=True,
+                    update_fields=["name", "phone"],
+                    **conflict_target,
+                )
+                ids = Customer.objects.ids_by_email(
+                    data["email"] for _, data, customer, _ in planned if not customer
+                )
+
+                all_changes = AddressChanges()
+                for index, data, customer, changes in planned:
+                    customer_id = (
+                        customer.id if customer else ids[data["email"].lower()]
+                    )
+                    for address in changes.create:
+                        address.customer_id = customer_id
+                    all_changes.merge(changes)
+                    self.add_result(
+                        index, "updated" if customer else "created", customer_id
+                    )
+                all_changes.apply(batch_size=BATCH_SIZE)
+            touch_customers(existing_ids)
+            stats.customers_created(ids.values())
+
+        return self.summary(len(items))
+
+    def summary(self, count):
+        results = [self.results[index] for index in sorted(self.results)]
+        statuses = [result["status"] for result in results]
+        return {
+            "items": count,
+            "created": statuses.count("created"),
+            "updated": statuses.count("updated"),
+            "error_count": statuses.count("invalid"),
+            "results": results,
+        }
@@ -8,6 +8,8 @@ from .views.customer import (
     AddressViewSet,
     dashboard_stats,
 )
+from .views.job import BackgroundJobViewSet
+from .views import async_read
 from .views.auth import (
     RegisterUserView,
     LoginUserView,
@@ -21,6 +23,7 @@ router.register(r"countries", CountryViewSet)
 router.register(r"states", StateViewSet)
 router.register(r"cities", CityViewSet)
 router.register(r"addresses", AddressViewSet)
+router.register(r"jobs", BackgroundJobViewSet)
 
 urlpatterns = [
     path("auth/register/", RegisterUserView.as_view(), name="register"),
@@ -28,5 +31,22 @@ urlpatterns = [
     path("auth/refresh/", RefreshTokenView.as_view(), name="token_refresh"),
     path("auth/logout/", LogoutUserView.as_view(), name="logout"),
     path("dashboard/", dashboard_stats, name="dashboard_stats"),
+    path("async/customers/", async_read.customer_list, name="async_customer_list"),
+    path(
+        "async/customers/<int:pk>/",
+        async_read.customer_detail,
+        name="async_customer_detail",
+    ),
+    path(
+        "async/states/by_country/",
+        async_read.states_by_country,
+        name="async_states_by_country",
+    ),
+    path(
+        "async/cities/by_state/",
+        async_read.cities_by_state,
+        name="async_cities_by_state",
+    ),
+    path("async/dashboard/", async_read.dashboard_stats, name="async_dashboard_stats"),
     path("", include(router.urls)),
 ]
@@ -0,0 +1,163 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from ..authentication import get_authenticator
+from ..filters import _to_int
+from ..geography import aget_geography, aget_geography_for
+from ..models import Customer
+from ..pagination import CustomerPagination
+from ..serializers import CustomerSerializer
+from ..stats import adashboard
+from .customer import CustomerViewSet, filtered_customers
+
+# Async-native versions of the hot read endpoints, for ASGI deployments.
+# Authentication, geography lookups and serialization stay on the event loop;
+# queries go through Django's async ORM.
+
+
+def _error(detail, status):
+    return JsonResponse({"detail": detail}, status=status)
+
+
+def _exception_response(exc):
+    """The JSON body and status DRF's exception handler gives ``exc``"""
+    if isinstance(exc.detail, (list, dict)):
+        return JsonResponse(exc.detail, status=exc.status_code, safe=False)
+    return _error(exc.detail, exc.status_code)
+
+
+def jwt_required(view):
+    """Authenticate with a JWT like BaseViewSet, without leaving the event loop"""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        authenticator = get_authenticator()
+        try:
+            result = await authenticator.aauthenticate(request)
+        except AuthenticationFailed as exc:
+            result, detail = None, exc.detail
+        else:
+            detail = "Authentication credentials were not provided."
+
+        if result is None:
+            response = _error(detail, 401)
+            response["WWW-Authenticate"] = authenticator.authenticate_header(request)
+            return response
+
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+async def _serialize_customers(customers, request):
+    city_ids = {
+        address.city_id
+        for customer in customers
+        for address in customer.addresses.all()
+    }
+    # Make sure CustomerSerializer finds every city without a query
+    await aget_geography_for(city_ids)
+    return CustomerSerializer(customers, many=True, context={"request": request}).data
+
+
+@require_GET
+@jwt_required
+async def customer_list(request):
+    """List customers with the filters and page parameters of CustomerViewSet"""
+    drf_request = Request(request)
+    # The location filters read the geography index
+    await aget_geography()
+    try:
+        if drf_request.query_params.get("search"):
+            # The full-text lookup is synchronous
+            queryset = await sync_to_async(filtered_customers)(request)
+        else:
+            queryset = filtered_customers(request)
+    except APIException as exc:
+        return _exception_response(exc)
+
+    paginator = CustomerPagination()
+    page_size = paginator.get_page_size(drf_request)
+    page_number = _to_int(drf_request.query_params.get(paginator.page_query_param, 1))
+    skip_count = drf_request.query_params.get(paginator.count_query_param) == "false"
+    if not page_number or page_number < 1:
+        return _error("Invalid page.", 404)
+
+    count = None if skip_count else await queryset.acount()
+    offset = (page_number - 1) * page_size
+    customers = [
+        customer async for customer in queryset[offset : offset + page_size + 1]
+    ]
+    if not customers and page_number > 1:
+        return _error("Invalid page.", 404)
+
+    url = request.build_absolute_uri()
+    next_url = previous_url = None
+    if len(customers) > page_size:
+        next_url = replace_query_param(url, paginator.page_query_param, page_number + 1)
+    if page_number == 2:
+        previous_url = remove_query_param(url, paginator.page_query_param)
+    elif page_number > 2:
+        previous_url = replace_query_param(
+            url, paginator.page_query_param, page_number - 1
+        )
+
+    results = await _serialize_customers(customers[:page_size], drf_request)
+    return JsonResponse(
+        {
+            "count": count,
+            "next": next_url,
+            "previous": previous_url,
+            "results": results,
+        }
+    )
+
+
+@require_GET
+@jwt_required
+async def customer_detail(request, pk):
+    try:
+        customer = await CustomerViewSet.queryset.aget(pk=pk)
+    except Customer.DoesNotExist:
+        return _error("No Customer matches the given query.", 404)
+
+    results = await _serialize_customers([customer], Request(request))
+    return JsonResponse(results[0])
+
+
+@require_GET
+@jwt_required
+async def states_by_country(request):
+    """Get states filtered by country ID"""
+    country_id = request.GET.get("country_id")
+    if not country_id:
+        return JsonResponse({"error": "country_id is required"}, status=400)
+
+    geography = await aget_geography()
+    states = geography.states_by_country.get(_to_int(country_id), [])
+    return JsonResponse(states, safe=False)
+
+
+@require_GET
+@jwt_required
+async def cities_by_state(request):
+    """Get cities filtered by state ID"""
+    state_id = request.GET.get("state_id")
+    if not state_id:
+        return JsonResponse({"error": "state_id is required"}, status=400)
+
+    geography = await aget_geography()
+    cities = geography.cities_by_state.get(_to_int(state_id), [])
+    return JsonResponse(cities, safe=False)
+
+
+@require_GET
+@jwt_required
+async def dashboard_stats(request):
+    return JsonResponse(await adashboard())
@@ -1,3 +1,4 @@
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.response import Response
 from rest_framework import status
@@ -5,7 +6,8 @@ from rest_framework.views import APIView
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from rest_framework.permissions import AllowAny
-from ..serializers import UserSerializer
+from ..blacklist import CachedBlacklistRefreshToken, blacklist_token
+from ..serializers import TokenRefreshSerializer, UserSerializer
 
 
 class RegisterUserView(APIView):
@@ -90,10 +92,12 @@ class RefreshTokenView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
-        from rest_framework_simplejwt.serializers import TokenRefreshSerializer
-
         serializer = TokenRefreshSerializer(data=request.data)
-        if serializer.is_valid():
+        try:
+            valid = serializer.is_valid()
+        except TokenError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_401_UNAUTHORIZED)
+        if valid:
             return Response(serializer.validated_data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -104,8 +108,11 @@ class LogoutUserView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data.get("refresh")
-            token = RefreshToken(refresh_token)
+            token = CachedBlacklistRefreshToken(refresh_token)
             token.blacklist()
+            # Revoke the access token too, for stateless authentication
+            if request.auth is not None:
+                blacklist_token(request.auth)
             return Response(
                 {"message": "Logged out successfully"}, status=status.HTTP_200_OK
             )
@@ -1,46 +1,115 @@
-from rest_framework import viewsets, filters, status
-from django.db.models import Count, F
+from rest_framework import viewsets, status
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.conf import settings
 from rest_framework.permissions import IsAuthenticated
-from ..models import Customer, Country, State, City, Address
+from ..authentication import get_authenticator
+from ..conditional import conditional, customer_stamp, geography_stamp
+from ..deletion import delete_customers
+from ..filters import CustomerFilter, _to_int
+from ..jobs import enqueue
+from ..models import Customer, Country, State, City, Address, BackgroundJob
+from ..imports import CustomerImport, ImportFileError
+from ..upserts import MAX_ITEMS as MAX_UPSERT_ITEMS, CustomerUpsert
+from ..pagination import CustomerCursorPagination, CustomerPagination
+from ..search import CustomerSearchFilter
+from ..renderers import FastJSONRenderer
 from ..serializers import (
+    CustomerRowSerializer,
     CustomerSerializer,
     CountrySerializer,
     StateSerializer,
     CitySerializer,
     AddressSerializer,
+    BackgroundJobSerializer,
 )
-from django.http import HttpResponse
-import pandas as pd
-import io
+from ..reports.columnar import (
+    ARROW_CONTENT_TYPE,
+    COLUMNAR_FILE_TYPES,
+    PARQUET_CONTENT_TYPE,
+    write_columnar,
+)
+from ..reports.jobs import report_params_error, start_report_job
+from ..reports.parallel import use_parallel, write_report_parallel
+from ..reports.rows import (
+    WRAPPED_COLUMNS,
+    iter_report_rows,
+    report_columns,
+    report_queryset,
+)
+from ..reports.writers import (
+    CSV_CONTENT_TYPE,
+    XLSX_CONTENT_TYPE,
+    stream_csv,
+    write_xlsx,
+)
+from ..geography import get_geography
+from ..stats import dashboard
+from django.db.models import Prefetch
+from django.http import FileResponse, Http404, StreamingHttpResponse
+import tempfile
+
 
+class JWTAuthenticationMixin:
+    """Authenticate with the JWT authentication JWT_STATELESS_AUTH selects"""
 
-class BaseViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
+
+    def get_authenticators(self):
+        if settings.JWT_STATELESS_AUTH:
+            return [get_authenticator()]
+        return super().get_authenticators()
+
+
+class BaseViewSet(JWTAuthenticationMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 
 class CustomerViewSet(BaseViewSet):
-    queryset = Customer.objects.all().order_by("-created_at")
+    queryset = (
+        Customer.objects.all()
+        .order_by("-created_at", "-id")
+        .prefetch_related(Prefetch("addresses", Address.objects.order_by("id")))
+    )
     serializer_class = CustomerSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ["name", "email"]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    pagination_class = CustomerPagination
+    filter_backends = [DjangoFilterBackend, CustomerSearchFilter]
+    filterset_class = CustomerFilter
     search_fields = ["name", "email"]
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        country_id = self.request.query_params.get("country_id")
-        state_id = self.request.query_params.get("state_id")
-
-        if country_id:
-            queryset = queryset.filter(addresses__city__state__country_id=country_id)
-        if state_id:
-            queryset = queryset.filter(addresses__city__state_id=state_id)
+    @property
+    def paginator(self):
+        """Use keyset pagination for ?pagination=cursor or a ?cursor= link"""
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            params = request.query_params if request else {}
+            if "cursor" in params or params.get("pagination") == "cursor":
+                self._paginator = CustomerCursorPagination()
+            else:
+                self._paginator = CustomerPagination()
+        return self._paginator
+
+    def list(self, request, *args, **kwargs):
+        """List customers from flat rows; see CustomerRowSerializer"""
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .prefetch_related(None)
+            .values(*CustomerRowSerializer.customer_fields)
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(CustomerRowSerializer(page).data)
+        return Response(CustomerRowSerializer(queryset).data)
 
-        return queryset
+    @conditional(customer_stamp)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     @action(detail=False, methods=["post"])
     def bulk_delete(self, request):
@@ -52,7 +121,30 @@ class CustomerViewSet(BaseViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        deleted_count, _ = Customer.objects.filter(id__in=customer_ids).delete()
+        if isinstance(customer_ids, list):
+            customer_ids = [_to_int(customer_id) for customer_id in customer_ids]
+        if not isinstance(customer_ids, list) or None in customer_ids:
+            return Response(
+                {"error": "customer_ids must be a list of integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Large sets are deleted by a background job; poll it under /api/jobs/
+        if (
+            request.data.get("async")
+            or len(customer_ids) > settings.BULK_DELETE_ASYNC_THRESHOLD
+        ):
+            job = BackgroundJob.objects.create(
+                kind="bulk_delete",
+                params={"customer_ids": customer_ids},
+                created_by_id=getattr(request.user, "id", None),
+            )
+            serializer = BackgroundJobSerializer(
+                enqueue(job), context={"request": request}
+            )
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+        deleted_count = delete_customers(customer_ids)
 
         if deleted_count > 0:
             return Response(status=status.HTTP_204_NO_CONTENT)
@@ -62,168 +154,195 @@ class CustomerViewSet(BaseViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+    @action(detail=False, methods=["post"])
+    def bulk_import(self, request):
+        """Import customers and addresses from an uploaded CSV or XLSX file"""
+        upload = request.FILES.get("file")
+
+        if not upload:
+            return Response(
+                {"error": "No file provided."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            summary = CustomerImport().run(upload)
+        except ImportFileError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(summary, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"])
+    def bulk_upsert(self, request):
+        """Create or update a list of customers, matched by email, with their addresses"""
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"error": "Expected a non-empty list of customers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > MAX_UPSERT_ITEMS:
+            return Response(
+                {"error": f"At most {MAX_UPSERT_ITEMS} customers per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        summary = CustomerUpsert().run(items)
+        return Response(summary, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=["get"])
     def generate_report(self, request):
-        """Generate an Excel report for all customers with multiple address handling"""
-        customers = self.get_queryset()
-        format_type = request.query_params.get("format", "separate_rows")
-
-        if format_type == "separate_rows":
-
-            customer_data = []
-            for customer in customers:
-                addresses = customer.addresses.all()
-                if addresses.exists():
-                    for address in addresses:
-                        customer_data.append(
-                            {
-                                "Customer ID": customer.id,
-                                "Name": customer.name,
-                                "Email": customer.email,
-                                "Phone": customer.phone or "",
-                                "Created At": customer.created_at.strftime(
-                                    "%Y-%m-%d %H:%M:%S"
-                                ),
-                                "Address ID": address.id,
-                                "Street": address.street,
-                                "City": address.city.name,
-                                "State": address.city.state.name,
-                                "Country": address.city.state.country.name,
-                                "Zip Code": address.zip_code or "",
-                            }
-                        )
-                else:
-
-                    customer_data.append(
-                        {
-                            "Customer ID": customer.id,
-                            "Name": customer.name,
-                            "Email": customer.email,
-                            "Phone": customer.phone or "",
-                            "Created At": customer.created_at.strftime(
-                                "%Y-%m-%d %H:%M:%S"
-                            ),
-                            "Address ID": "",
-                            "Street": "",
-                            "City": "",
-                            "State": "",
-                            "Country": "",
-                            "Zip Code": "",
-                        }
-                    )
+        """Stream an Excel, CSV, Parquet or Arrow report of the filtered customers"""
+        customers = self.filter_queryset(self.get_queryset())
+        layout = request.query_params.get("format", "separate_rows")
+        file_type = request.query_params.get("file_type", "xlsx")
+
+        error = report_params_error(layout, file_type)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        if file_type in COLUMNAR_FILE_TYPES:
+            output = tempfile.TemporaryFile()
+            write_columnar(output, customers, file_type)
+            output.seek(0)
+            return FileResponse(
+                output,
+                as_attachment=True,
+                filename=f"customer_report.{file_type}",
+                content_type=(
+                    PARQUET_CONTENT_TYPE
+                    if file_type == "parquet"
+                    else ARROW_CONTENT_TYPE
+                ),
+            )
+
+        columns = report_columns(layout)
+        rows = iter_report_rows(customers, layout)
+
+        if file_type == "csv":
+            response = StreamingHttpResponse(
+                stream_csv(columns, rows), content_type=CSV_CONTENT_TYPE
+            )
+            response["Content-Disposition"] = (
+                'attachment; filename="customer_report.csv"'
+            )
+            return response
+
+        wrapped_columns = WRAPPED_COLUMNS if layout == "combined" else ()
+        output = tempfile.TemporaryFile()
+        if use_parallel(report_queryset(customers).count()):
+            write_report_parallel(
+                output, customers, layout, file_type, columns, wrapped_columns
+            )
         else:
+            write_xlsx(output, columns, rows, wrapped_columns)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename="customer_report.xlsx",
+            content_type=XLSX_CONTENT_TYPE,
+        )
 
-            customer_data = []
-            for customer in customers:
-                addresses = customer.addresses.all()
-                addresses_info = []
-                cities = []
-                states = []
-                countries = []
-                zip_codes = []
-
-                if addresses.exists():
-                    for address in addresses:
-                        addresses_info.append(address.street)
-                        cities.append(address.city.name)
-                        states.append(address.city.state.name)
-                        countries.append(address.city.state.country.name)
-                        zip_codes.append(address.zip_code or "")
-
-                customer_data.append(
-                    {
-                        "Customer ID": customer.id,
-                        "Name": customer.name,
-                        "Email": customer.email,
-                        "Phone": customer.phone or "",
-                        "Created At": customer.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                        "Streets": " | ".join(addresses_info) if addresses_info else "",
-                        "Cities": " | ".join(cities) if cities else "",
-                        "States": " | ".join(states) if states else "",
-                        "Countries": " | ".join(countries) if countries else "",
-                        "Zip Codes": " | ".join(zip_codes) if zip_codes else "",
-                    }
-                )
-
-        df = pd.DataFrame(customer_data)
-
-        excel_file = io.BytesIO()
-
-        with pd.ExcelWriter(excel_file, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="Customers")
-
-            worksheet = writer.sheets["Customers"]
-
-            for idx, col in enumerate(df.columns):
-                series = df[col]
-                max_length = (
-                    max(
-                        series.astype(str).map(len).max(),
-                        len(str(series.name)),
-                    )
-                    + 2
-                )
-                worksheet.set_column(idx, idx, max_length)
-
-                if format_type == "combined" and col in [
-                    "Streets",
-                    "Cities",
-                    "States",
-                    "Countries",
-                    "Zip Codes",
-                ]:
-                    worksheet.set_column(
-                        idx,
-                        idx,
-                        max_length,
-                        writer.book.add_format({"text_wrap": True}),
-                    )
-
-        excel_file.seek(0)
-
-        response = HttpResponse(
-            excel_file.getvalue(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    @action(detail=False, methods=["post"])
+    def report_jobs(self, request):
+        """Start generating a report in the background, reusing a cached one if possible"""
+        error = report_params_error(
+            request.data.get("format", "separate_rows"),
+            request.data.get("file_type", "xlsx"),
+        )
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        job, created = start_report_job(request.data, request.user)
+        serializer = BackgroundJobSerializer(job, context={"request": request})
+        return Response(
+            serializer.data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK,
         )
-        response["Content-Disposition"] = 'attachment; filename="customer_report.xlsx"'
-        return response
+
+    def perform_content_negotiation(self, request, force=False):
+        # generate_report reads ?format= as the report layout, not as a renderer
+        if self.action == "generate_report":
+            force = True
+        return super().perform_content_negotiation(request, force)
+
+
+def filtered_customers(http_request, action="list"):
+    """Apply CustomerViewSet's filtering to a plain Django request"""
+    view = CustomerViewSet(
+        request=Request(http_request),
+        action=action,
+        format_kwarg=None,
+        args=(),
+        kwargs={},
+    )
+    return view.filter_queryset(view.get_queryset())
+
+
+class GeographyCacheMixin:
+    """Serve list and retrieve from the in-memory geography index.
+
+    Responses carry the index version as their ETag, so unchanged geography
+    is answered with a 304.
+    """
+
+    geography_attr = None
+
+    @conditional(geography_stamp)
+    def list(self, request, *args, **kwargs):
+        items = list(getattr(get_geography(), self.geography_attr).values())
+        page = self.paginate_queryset(items)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(items)
+
+    @conditional(geography_stamp)
+    def retrieve(self, request, *args, **kwargs):
+        item = getattr(get_geography(), self.geography_attr).get(_to_int(kwargs["pk"]))
+        if item is None:
+            raise Http404
+        return Response(item)
 
 
-class CountryViewSet(BaseViewSet):
+class CountryViewSet(GeographyCacheMixin, BaseViewSet):
     queryset = Country.objects.all()
     serializer_class = CountrySerializer
+    geography_attr = "countries"
 
 
-class StateViewSet(BaseViewSet):
+class StateViewSet(GeographyCacheMixin, BaseViewSet):
     queryset = State.objects.all()
     serializer_class = StateSerializer
+    geography_attr = "states"
 
     @action(detail=False, methods=["get"])
+    @conditional(geography_stamp)
     def by_country(self, request):
         """Get states filtered by country ID"""
         country_id = request.query_params.get("country_id")
         if not country_id:
             return Response({"error": "country_id is required"}, status=400)
 
-        states = State.objects.filter(country_id=country_id)
-        serializer = self.get_serializer(states, many=True)
-        return Response(serializer.data)
+        states = get_geography().states_by_country.get(_to_int(country_id), [])
+        return Response(states)
 
 
-class CityViewSet(BaseViewSet):
+class CityViewSet(GeographyCacheMixin, BaseViewSet):
     queryset = City.objects.all()
     serializer_class = CitySerializer
+    geography_attr = "cities"
 
     @action(detail=False, methods=["get"])
+    @conditional(geography_stamp)
     def by_state(self, request):
         """Get cities filtered by state ID"""
         state_id = request.query_params.get("state_id")
         if not state_id:
             return Response({"error": "state_id is required"}, status=400)
 
-        cities = City.objects.filter(state_id=state_id)
-        serializer = self.get_serializer(cities, many=True)
-        return Response(serializer.data)
+        cities = get_geography().cities_by_state.get(_to_int(state_id), [])
+        return Response(cities)
 
 
 class AddressViewSet(BaseViewSet):
@@ -231,15 +350,9 @@ class AddressViewSet(BaseViewSet):
     serializer_class = AddressSerializer
 
 
-@api_view(["GET"])
-def dashboard_stats(request):
-    customers_by_country = Customer.objects.values(
-        country=F("addresses__city__state__country__name")
-    ).annotate(count=Count("id", distinct=True))
+class DashboardStatsView(JWTAuthenticationMixin, APIView):
+    def get(self, request):
+        return Response(dashboard())
 
-    response_data = {
-        "totalCustomers": Customer.objects.count(),
-        "customersByCountry": list(customers_by_country),
-    }
 
-    return Response(response_data)
+dashboard_stats = DashboardStatsView.as_view()
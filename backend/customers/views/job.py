@@ -0,0 +1,34 @@
+import os
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.http import FileResponse
+from ..models import BackgroundJob
+from ..serializers import BackgroundJobSerializer
+from .customer import BaseViewSet
+
+
+class BackgroundJobViewSet(BaseViewSet):
+    queryset = BackgroundJob.objects.all().order_by("-created_at")
+    serializer_class = BackgroundJobSerializer
+    http_method_names = ["get", "head", "options"]
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        """Download the file produced by a completed job"""
+        job = self.get_object()
+
+        if job.status != BackgroundJob.Status.COMPLETED or not os.path.exists(
+            job.file_path
+        ):
+            return Response(
+                {"error": "The job has no file available for download."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        extension = os.path.splitext(job.file_path)[1]
+        return FileResponse(
+            open(job.file_path, "rb"),
+            as_attachment=True,
+            filename=f"customer_report{extension}",
+        )
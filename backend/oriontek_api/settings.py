@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -42,11 +43,13 @@ INSTALLED_APPS = [
     "corsheaders",
     "rest_framework",
     "rest_framework_simplejwt",
+    "rest_framework_simplejwt.token_blacklist",
     "django_filters",
     "drf_spectacular",
 ]
 
 MIDDLEWARE = [
+    "customers.instrumentation.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -180,9 +183,79 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
     "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "customers.serializers.TokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Use a cache shared between processes (file-based, Redis, Memcached) when
+# running more than one worker so invalidations reach all of them.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Customer ETag versions: one key per customer, kept apart so they can't
+    # evict the default cache's entries. TIMEOUT bounds how long a process
+    # may answer 304 for a customer another process changed.
+    "customer_versions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "customer-versions",
+        "TIMEOUT": 60,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Seconds a process trusts its in-memory geography index before checking
+# the shared cache for a newer version.
+GEOGRAPHY_CACHE_CHECK_INTERVAL = 5
+
+# Background jobs (report generation) run on an in-process thread pool.
+# Set JOBS_EAGER to run them synchronously, e.g. in tests.
+JOB_WORKERS = 2
+JOBS_EAGER = False
+# Jobs still pending or running after this long were lost with the process
+# that ran them, and are marked as failed.
+JOB_TIMEOUT = timedelta(hours=1)
+
+# Bulk deletes of more customers than this run as a background job
+BULK_DELETE_ASYNC_THRESHOLD = 5000
+
+REPORTS_ROOT = BASE_DIR / "reports"
+REPORT_CACHE_TTL = timedelta(minutes=15)
+
+# Reports of at least REPORT_PARALLEL_MIN_ROWS rows are built in shards on a
+# pool of REPORT_WORKERS processes.
+REPORT_WORKERS = os.cpu_count() or 1
+REPORT_PARALLEL_MIN_ROWS = 100_000
+
+# Authenticate from the signed JWT claims alone (a TokenUser, no user query
+# per request). Validated tokens are cached for JWT_TOKEN_CACHE_TTL seconds
+# and the access token blacklist is reloaded every
+# JWT_BLACKLIST_REFRESH_INTERVAL seconds.
+JWT_STATELESS_AUTH = False
+JWT_TOKEN_CACHE_TTL = 60
+JWT_TOKEN_CACHE_SIZE = 10000
+JWT_BLACKLIST_REFRESH_INTERVAL = 30
+
+# Per-request timings, query counts and duplicate-query detection, reported
+# in a Server-Timing header and a log line. PERFORMANCE_SAMPLE_RATE is the
+# fraction of requests measured; a low rate is cheap enough for production.
+PERFORMANCE_INSTRUMENTATION = False
+PERFORMANCE_SAMPLE_RATE = 1.0
+PERFORMANCE_REPEATED_QUERY_THRESHOLD = 10
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "customers.instrumentation": {"handlers": ["console"], "level": "INFO"},
+    },
+}